@@ -0,0 +1,483 @@
+"""
+Benchmark de carga da API de imóveis.
+
+    python benchmark.py seed --rows 100000
+    python benchmark.py run --concurrency 32 --duration 60 --out atual.json
+    python benchmark.py compare baseline.json atual.json --threshold 0.10
+
+`seed` popula o banco configurado no .env (MySQL ou SQLite) com dados sintéticos no mesmo
+formato de imoveis.sql. `run` sobe a API com o Gunicorn (gunicorn.conf.py)
+numa porta livre, ou usa uma já em execução com --url, dispara uma mistura
+realista de leituras e escritas e grava throughput e p50/p95/p99 por rota
+em JSON. `compare` sai com código 1 se alguma rota regrediu além do limite.
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+TIPOS_LOGRADOURO = ["Rua", "Avenida", "Travessa", "Alameda"]
+TIPOS = ["casa", "apartamento", "terreno", "casa em condominio"]
+NOMES = [
+    "Taylor", "Price", "Stone", "White", "Amber", "Robbins", "Mitchell",
+    "Shelly", "Scott", "Patton", "Thompson", "Heather", "Angela", "Pamela",
+    "Floyd", "King", "Ross", "Christina", "Payne", "Brian", "Crosby",
+    "Reynolds", "Young", "Natasha", "Rebecca", "Oneill", "Kayla", "Tyler",
+]
+SUFIXOS = [
+    "Common", "Prairie", "Ranch", "Isle", "Causeway", "Terrace", "Springs",
+    "Light", "Lane", "Ridge", "Drive", "Turnpike", "Greens", "Parkways",
+    "Circle", "Manors", "Trail", "Mills", "Haven", "Canyon", "Garden",
+]
+PREFIXOS_LOCAL = ["", "North ", "South ", "East ", "West ", "Lake ", "Port ", "New "]
+RADICAIS_LOCAL = [
+    "Garyville", "Danielle", "Jennashire", "Colonton", "Reneeberg", "Burkeview",
+    "Lindseyview", "Potterbury", "Rebeccaview", "Alexandra", "Andreafurt",
+    "Maryview", "Isaacchester", "Medinatown", "Poolefurt", "Philipstad",
+    "Davidville", "Kennethhaven", "Garyborough", "Paigeview", "Dennisside",
+]
+
+# Peso de cada operação na mistura padrão (soma 100)
+MIX = {
+    "list_default": 30,
+    "list_tipo": 15,
+    "list_cidade": 12,
+    "list_sorted": 8,
+    "get_imovel": 25,
+    "add_imovel": 4,
+    "update_imovel": 3,
+    "delete_imovel": 3,
+}
+
+# Rota (endpoint) em que cada operação é contabilizada
+ROUTE_OF = {
+    "list_default": "get_imoveis",
+    "list_tipo": "get_imoveis",
+    "list_cidade": "get_imoveis",
+    "list_sorted": "get_imoveis",
+    "get_imovel": "get_imovel",
+    "add_imovel": "add_imovel",
+    "update_imovel": "update_imovel",
+    "delete_imovel": "delete_imovel",
+}
+
+SORT_FIELDS = ["id", "valor", "data_aquisicao", "cidade", "tipo"]
+
+
+# --------------------------------------------------------------------------
+# Dados sintéticos
+# --------------------------------------------------------------------------
+
+
+def localidades(n):
+    """Nomes de cidade/bairro determinísticos; n define a cardinalidade."""
+    nomes = []
+    for i in range(n):
+        prefixo = PREFIXOS_LOCAL[i % len(PREFIXOS_LOCAL)]
+        radical = RADICAIS_LOCAL[(i // len(PREFIXOS_LOCAL)) % len(RADICAIS_LOCAL)]
+        volta = i // (len(PREFIXOS_LOCAL) * len(RADICAIS_LOCAL))
+        nomes.append(f"{prefixo}{radical}{' ' + str(volta) if volta else ''}")
+    return nomes
+
+
+def gerar_imoveis(rows, seed=42):
+    """
+    Gera `rows` tuplas no formato de imoveis.sql. As cidades seguem uma
+    distribuição enviesada (poucas cidades concentram muitos imóveis), como
+    numa base real.
+    """
+    rng = random.Random(seed)
+    cidades = localidades(max(50, int(rows**0.5)))
+    bairros = localidades(max(100, int(rows**0.6)))
+    pesos = [1 / (i + 1) for i in range(len(cidades))]
+    inicio = datetime.date(2014, 1, 1).toordinal()
+    fim = datetime.date(2025, 12, 31).toordinal()
+    gerados = 0
+    while gerados < rows:
+        lote = min(10_000, rows - gerados)
+        for cidade in rng.choices(cidades, weights=pesos, k=lote):
+            yield (
+                f"{rng.choice(NOMES)} {rng.choice(SUFIXOS)}",
+                rng.choice(TIPOS_LOGRADOURO),
+                rng.choice(bairros),
+                cidade,
+                f"{rng.randrange(100000):05d}",
+                rng.choice(TIPOS),
+                round(rng.uniform(50_000, 1_000_000), 2),
+                datetime.date.fromordinal(rng.randint(inicio, fim)).isoformat(),
+            )
+        gerados += lote
+
+
+def seed(args):
+    from repository import criar_repositorio
+
+    repo = criar_repositorio()
+    repo.criar_schema()
+    if args.truncate:
+        repo.truncate()
+
+    lote = []
+    inseridos = 0
+    inicio = time.perf_counter()
+    for row in gerar_imoveis(args.rows, args.seed):
+        lote.append(row)
+        if len(lote) == args.batch:
+            repo.add_many(lote)
+            inseridos += len(lote)
+            lote = []
+            print(f"\r{inseridos}/{args.rows} linhas", end="", file=sys.stderr)
+    if lote:
+        repo.add_many(lote)
+        inseridos += len(lote)
+    repo.close_all()
+    elapsed = time.perf_counter() - inicio
+    print(f"\r{inseridos} linhas inseridas em {elapsed:.1f}s", file=sys.stderr)
+
+
+# --------------------------------------------------------------------------
+# Servidor
+# --------------------------------------------------------------------------
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(args):
+    """Sobe a API com o Gunicorn de produção e espera /ready."""
+    port = porta_livre()
+    env = dict(os.environ, BIND=f"127.0.0.1:{port}", ACCESS_LOG="")
+    if args.workers:
+        env["WEB_CONCURRENCY"] = str(args.workers)
+    if args.threads:
+        env["WEB_THREADS"] = str(args.threads)
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=here,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit("Gunicorn terminou antes de ficar pronto")
+        try:
+            status, _ = requisitar(http.client.HTTPConnection("127.0.0.1", port), "GET", "/ready")
+            if status == 200:
+                return proc, url
+        except OSError:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    sys.exit("Timeout esperando /ready")
+
+
+def requisitar(conn, method, path, body=None):
+    headers = {}
+    if body is not None:
+        body = json.dumps(body)
+        headers["Content-Type"] = "application/json"
+    conn.request(method, path, body=body, headers=headers)
+    resp = conn.getresponse()
+    data = resp.read()
+    return resp.status, data
+
+
+# --------------------------------------------------------------------------
+# Carga
+# --------------------------------------------------------------------------
+
+
+class Workload:
+    """Escolhe as requisições da mistura a partir de uma amostra da base."""
+
+    def __init__(self, url, mix):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.base = parsed.path.rstrip("/") + "/api/v1/imoveis"
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.created = []
+        self.lock = threading.Lock()
+        self._amostrar()
+
+    def _get_json(self, path):
+        status, data = requisitar(self.connect(), "GET", path)
+        if status != 200:
+            sys.exit(f"GET {path} retornou {status}")
+        return json.loads(data)
+
+    def connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def _amostrar(self):
+        primeira = self._get_json(f"{self.base}?per_page=100&sort=id&order=asc")
+        ultima = self._get_json(f"{self.base}?per_page=1&sort=id&order=desc")
+        if not primeira["data"]:
+            sys.exit("Base vazia: rode `python benchmark.py seed` antes")
+        self.min_id = primeira["data"][0]["id"]
+        self.max_id = ultima["data"][0]["id"]
+        self.total = primeira["pagination"]["total"]
+        self.total_pages = max(1, self.total // 10)
+        self.cidades = sorted({i["cidade"] for i in primeira["data"]})
+        self.tipos = sorted({i["tipo"] for i in primeira["data"] if i["tipo"]})
+
+    def _pagina(self, rng):
+        # Páginas iniciais concentram o acesso
+        return min(self.total_pages, int(rng.paretovariate(1.2)))
+
+    def _corpo(self, rng):
+        row = next(gerar_imoveis(1, rng.randrange(1 << 30)))
+        keys = ["logradouro", "tipo_logradouro", "bairro", "cidade", "cep", "tipo", "valor", "data_aquisicao"]
+        return dict(zip(keys, row))
+
+    def proxima(self, rng):
+        """Retorna (operação, método, caminho, corpo)."""
+        op = rng.choices(self.ops, weights=self.weights)[0]
+        q = urllib.parse.urlencode
+        if op == "list_default":
+            return op, "GET", f"{self.base}?{q({'page': self._pagina(rng)})}", None
+        if op == "list_tipo":
+            params = {"tipo": rng.choice(self.tipos), "page": self._pagina(rng)}
+            return op, "GET", f"{self.base}?{q(params)}", None
+        if op == "list_cidade":
+            params = {"cidade": rng.choice(self.cidades), "per_page": rng.choice([10, 20, 50])}
+            return op, "GET", f"{self.base}?{q(params)}", None
+        if op == "list_sorted":
+            params = {
+                "sort": rng.choice(SORT_FIELDS),
+                "order": rng.choice(["asc", "desc"]),
+                "page": self._pagina(rng),
+            }
+            return op, "GET", f"{self.base}?{q(params)}", None
+        if op == "get_imovel":
+            return op, "GET", f"{self.base}/{rng.randint(self.min_id, self.max_id)}", None
+        if op in ("update_imovel", "delete_imovel"):
+            with self.lock:
+                if self.created:
+                    if op == "delete_imovel":
+                        id_ = self.created.pop(rng.randrange(len(self.created)))
+                    else:
+                        id_ = rng.choice(self.created)
+                    method = "DELETE" if op == "delete_imovel" else "PUT"
+                    body = None if op == "delete_imovel" else self._corpo(rng)
+                    return op, method, f"{self.base}/{id_}", body
+        return "add_imovel", "POST", self.base, self._corpo(rng)
+
+    def registrar(self, op, status, data):
+        if op == "add_imovel" and status == 201:
+            with self.lock:
+                self.created.append(json.loads(data)["id"])
+
+    def limpar(self):
+        """Remove os imóveis criados pelo benchmark que sobraram."""
+        conn = self.connect()
+        for id_ in self.created:
+            requisitar(conn, "DELETE", f"{self.base}/{id_}")
+        self.created = []
+
+
+def percentil(ordenados, p):
+    """Percentil pelo método nearest-rank sobre uma lista já ordenada."""
+    if not ordenados:
+        return None
+    k = max(1, math.ceil(p / 100 * len(ordenados)))
+    return ordenados[k - 1]
+
+
+def resumir(latencias, erros, duracao):
+    resumo = {}
+    for route in sorted(set(latencias) | set(erros)):
+        amostras = sorted(latencias.get(route, []))
+        resumo[route] = {
+            "requests": len(amostras),
+            "errors": erros.get(route, 0),
+            "throughput_rps": round(len(amostras) / duracao, 2),
+            "mean_ms": round(sum(amostras) / len(amostras) * 1000, 3) if amostras else None,
+            "p50_ms": _ms(percentil(amostras, 50)),
+            "p95_ms": _ms(percentil(amostras, 95)),
+            "p99_ms": _ms(percentil(amostras, 99)),
+        }
+    return resumo
+
+
+def _ms(segundos):
+    return None if segundos is None else round(segundos * 1000, 3)
+
+
+def executar_carga(workload, concurrency, duration, warmup, seed=0):
+    latencias = {}
+    erros = {}
+    lock = threading.Lock()
+    inicio_medicao = time.monotonic() + warmup
+    fim = inicio_medicao + duration
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        conn = workload.connect()
+        local_lat = {}
+        local_err = {}
+        while True:
+            agora = time.monotonic()
+            if agora >= fim:
+                break
+            op, method, path, body = workload.proxima(rng)
+            route = ROUTE_OF[op]
+            t0 = time.perf_counter()
+            try:
+                status, data = requisitar(conn, method, path, body)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = workload.connect()
+                status, data = None, b""
+            elapsed = time.perf_counter() - t0
+            workload.registrar(op, status, data)
+            if agora < inicio_medicao:
+                continue
+            if status is None or status >= 500:
+                local_err[route] = local_err.get(route, 0) + 1
+            else:
+                local_lat.setdefault(route, []).append(elapsed)
+        conn.close()
+        with lock:
+            for route, amostras in local_lat.items():
+                latencias.setdefault(route, []).extend(amostras)
+            for route, n_err in local_err.items():
+                erros[route] = erros.get(route, 0) + n_err
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, erros
+
+
+def run(args):
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = iniciar_servidor(args)
+    try:
+        workload = Workload(url, MIX)
+        latencias, erros = executar_carga(
+            workload, args.concurrency, args.duration, args.warmup, args.seed
+        )
+        workload.limpar()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=60)
+
+    total = [s for amostras in latencias.values() for s in amostras]
+    resultado = {
+        "meta": {
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "url": url if args.url else "gunicorn (local)",
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "rows": workload.total,
+            "mix": MIX,
+        },
+        "routes": resumir(latencias, erros, args.duration),
+        "total": resumir({"all": total}, {"all": sum(erros.values())}, args.duration)["all"],
+    }
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(texto + "\n")
+    print(texto)
+
+
+# --------------------------------------------------------------------------
+# Comparação
+# --------------------------------------------------------------------------
+
+
+def comparar(baseline, atual, threshold):
+    """
+    Lista as regressões de `atual` em relação a `baseline`: throughput
+    menor ou latências (p50/p95/p99) maiores que o limite relativo.
+    """
+    regressoes = []
+    for route, base in baseline["routes"].items():
+        cur = atual["routes"].get(route)
+        if cur is None:
+            regressoes.append(f"{route}: ausente no resultado atual")
+            continue
+        if base["throughput_rps"] and cur["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressoes.append(
+                f"{route}: throughput {base['throughput_rps']} -> {cur['throughput_rps']} req/s"
+            )
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if base[metric] is None or cur[metric] is None:
+                continue
+            if cur[metric] > base[metric] * (1 + threshold):
+                regressoes.append(f"{route}: {metric} {base[metric]} -> {cur[metric]}")
+    return regressoes
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        atual = json.load(f)
+    regressoes = comparar(baseline, atual, args.threshold)
+    if regressoes:
+        print(f"Regressões acima de {args.threshold:.0%}:")
+        for r in regressoes:
+            print(f"  - {r}")
+        sys.exit(1)
+    print(f"Sem regressões acima de {args.threshold:.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da API de imóveis")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_seed = sub.add_parser("seed", help="Popula o banco com dados sintéticos")
+    p_seed.add_argument("--rows", type=int, default=100_000, help="1k a 10M linhas")
+    p_seed.add_argument("--batch", type=int, default=5_000)
+    p_seed.add_argument("--seed", type=int, default=42)
+    p_seed.add_argument("--truncate", action="store_true", help="Esvazia a tabela antes")
+    p_seed.set_defaults(func=seed)
+
+    p_run = sub.add_parser("run", help="Executa a carga e grava os resultados")
+    p_run.add_argument("--url", help="API já em execução (senão sobe o Gunicorn)")
+    p_run.add_argument("--concurrency", type=int, default=16)
+    p_run.add_argument("--duration", type=float, default=30)
+    p_run.add_argument("--warmup", type=float, default=5)
+    p_run.add_argument("--workers", type=int, help="WEB_CONCURRENCY do Gunicorn")
+    p_run.add_argument("--threads", type=int, help="WEB_THREADS do Gunicorn")
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument("--out", help="Arquivo JSON de saída")
+    p_run.set_defaults(func=run)
+
+    p_cmp = sub.add_parser("compare", help="Compara com um baseline salvo")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="Regressão relativa tolerada")
+    p_cmp.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Cache LRU em memória, com expiração (TTL), para resultados de leitura.
+    Cada processo tem o seu e escritas locais chamam clear(), mas uma escrita
+    atendida por outro worker não o limpa: ela fica invisível aqui por até
+    `ttl` segundos. Por isso o padrão é 0 (desligado); ligue só onde essa
+    defasagem for aceitável.
+    """
+
+    def __init__(self, ttl=0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def get(self, key):
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _after_fork(self):
+        # O lock pode ter sido herdado travado por outra thread do pai
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
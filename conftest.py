@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+import pytest
+
+from repository import SQLiteRepository
+
+# Por padrão os testes rodam contra um SQLite temporário; para testar contra
+# o MySQL do .env, exporte DATABASE_BACKEND=mysql antes de rodar o pytest.
+os.environ.setdefault("DATABASE_BACKEND", "sqlite")
+_tmp = tempfile.mkdtemp(prefix="imoveis-")
+os.environ.setdefault("SQLITE_PATH", os.path.join(_tmp, "imoveis.db"))
+os.environ.setdefault("DISTRIBUTION_SNAPSHOT", os.path.join(_tmp, "valor_distribution.json"))
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """Repositório SQLite vazio, num arquivo próprio do teste."""
+    repo = SQLiteRepository(str(tmp_path / "imoveis.db"))
+    yield repo
+    repo.close_all()
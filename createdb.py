@@ -1,28 +1,21 @@
-from db import get_db_connection
+import os
 
-cnx = get_db_connection()
-cursor = cnx.cursor()
+from repository import criar_repositorio
 
-# SQL para criar a tabela no MySQL
-sql_script = """
-CREATE TABLE IF NOT EXISTS imoveis (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    logradouro VARCHAR(255) NOT NULL,
-    tipo_logradouro VARCHAR(255),
-    bairro VARCHAR(255),
-    cidade VARCHAR(255) NOT NULL,
-    cep VARCHAR(20),
-    tipo VARCHAR(50),
-    valor DECIMAL(10, 2),
-    data_aquisicao DATE
-);
-"""
+# Backend escolhido por DATABASE_BACKEND (mysql ou sqlite)
+repo = criar_repositorio()
 
-cursor.execute(sql_script)
-cnx.commit()
+# Cria as tabelas imoveis e imoveis_arquivo (e os índices) no schema do backend
+repo.criar_schema()
+
+# Partições por data_aquisicao (só no MySQL); maintenance.py estende depois
+repo.preparar_particoes(
+    os.getenv("PARTITION_GRANULARITY", "year"),
+    int(os.getenv("PARTITION_START", 2010)),
+    int(os.getenv("PARTITION_AHEAD", 1)),
+)
 
 with open("imoveis.sql", "r") as file:
-    cursor.execute(file.read())
+    repo.executar_script(file.read())
 
-cursor.close()
-cnx.close()
\ No newline at end of file
+repo.close_all()
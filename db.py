@@ -1,5 +1,8 @@
 import mysql.connector
 import os
+import sqlite3
+import threading
+import time
 from mysql.connector import Error
 
 from dotenv import load_dotenv
@@ -15,10 +18,100 @@ def get_db_connection():
             port=os.getenv("DATABASE_PORT"),
             database=os.getenv("DATABASE_DB"),
             autocommit=True,
-             connection_timeout=5 
+             connection_timeout=5
         )
         if connection.is_connected():
             return connection
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+class DatabaseUnavailable(Exception):
+    """Não foi possível abrir uma conexão com o banco."""
+
+
+class LazyDatabase:
+    """
+    Conexão com o banco aberta sob demanda (uma por thread), com novas
+    tentativas e backoff exponencial quando a conexão falha.
+
+    É segura para servidores prefork: após um fork, o processo filho
+    esquece as conexões herdadas e abre as suas na primeira requisição.
+    """
+
+    def __init__(self, connect=get_db_connection, retries=3, backoff=0.5):
+        self._connect = connect
+        self.retries = retries
+        self.backoff = backoff
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+        self._inherited = []
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._opened.append(conn)
+        return conn
+
+    def _open(self):
+        for attempt in range(self.retries):
+            conn = self._connect()
+            if conn is not None:
+                return conn
+            if attempt < self.retries - 1:
+                time.sleep(self.backoff * 2**attempt)
+        raise DatabaseUnavailable(
+            f"Falha ao conectar ao banco após {self.retries} tentativas"
+        )
+
+    def ping(self):
+        """Verifica se o banco responde, reabrindo a conexão se preciso."""
+        try:
+            cursor = self.connection().cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except (DatabaseUnavailable, Error, sqlite3.Error):
+            self.reset()
+            return False
+
+    def reset(self):
+        """Descarta a conexão da thread atual; a próxima chamada reconecta."""
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            with self._lock:
+                if conn in self._opened:
+                    self._opened.remove(conn)
+            _close_quietly(conn)
+
+    def close_all(self):
+        """Fecha as conexões de todas as threads (encerramento do worker)."""
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            _close_quietly(conn)
+        self._local = threading.local()
+
+    def _after_fork(self):
+        # O socket herdado é compartilhado com o processo pai: não pode ser
+        # fechado aqui (o QUIT derrubaria a conexão do pai), só abandonado.
+        # As referências ficam guardadas para o coletor de lixo não fechá-lo.
+        self._inherited.append((self._local, self._opened))
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except (Error, sqlite3.Error):
+        pass
@@ -0,0 +1,465 @@
+import datetime
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from repository import sem_acento
+
+# Muda quando o formato das chaves do snapshot muda (2: sem acentos)
+FORMATO_SNAPSHOT = 2
+
+
+class QuantileSketch:
+    """
+    Sketch de quantis com erro relativo garantido (DDSketch). Cada valor cai
+    num bucket logarítmico de razão gamma = (1 + alpha) / (1 - alpha); o
+    quantil estimado fica a no máximo alpha (relativo) do valor real. É
+    mesclável (soma de contagens) e aceita remoções exatas.
+    """
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, valor):
+        return math.ceil(math.log(valor) / self._log_gamma)
+
+    def _valor(self, index):
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def add(self, valor, n=1):
+        if valor <= 0:
+            self.zero_count += n
+        else:
+            i = self._index(valor)
+            self.bins[i] = self.bins.get(i, 0) + n
+        self.count += n
+
+    def remove(self, valor):
+        if valor <= 0:
+            if self.zero_count:
+                self.zero_count -= 1
+                self.count -= 1
+            return
+        i = self._index(valor)
+        if self.bins.get(i):
+            self.bins[i] -= 1
+            if not self.bins[i]:
+                del self.bins[i]
+            self.count -= 1
+
+    def merge(self, other):
+        for i, n in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if rank < seen:
+                return self._valor(i)
+        return self._valor(max(self.bins))
+
+    def to_dict(self):
+        return {
+            "alpha": self.alpha,
+            "zero_count": self.zero_count,
+            "bins": {str(i): n for i, n in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["alpha"])
+        sketch.zero_count = data["zero_count"]
+        sketch.bins = {int(i): n for i, n in data["bins"].items()}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
+
+
+class Histogram:
+    """
+    Histograma de buckets fixos de largura `width`, guardado de forma
+    esparsa. As contagens são exatas; rebin() agrupa buckets vizinhos sem
+    perder exatidão, porque as bordas continuam múltiplas de `width`.
+    """
+
+    def __init__(self, width=10_000):
+        self.width = width
+        self.bins = {}
+
+    def _index(self, valor):
+        return int(valor // self.width)
+
+    def add(self, valor, n=1):
+        i = self._index(valor)
+        self.bins[i] = self.bins.get(i, 0) + n
+
+    def remove(self, valor):
+        i = self._index(valor)
+        if self.bins.get(i):
+            self.bins[i] -= 1
+            if not self.bins[i]:
+                del self.bins[i]
+
+    def merge(self, other):
+        for i, n in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + n
+
+    def rebin(self, buckets):
+        """Até `buckets` faixas contíguas cobrindo do menor ao maior valor."""
+        if not self.bins:
+            return []
+        lo, hi = min(self.bins), max(self.bins)
+        step = math.ceil((hi - lo + 1) / buckets)
+        # Percorre só os buckets ocupados: a faixa entre lo e hi pode ter
+        # bilhões de índices vazios (ex.: um valor muito acima dos demais)
+        counts = [0] * ((hi - lo) // step + 1)
+        for i, n in self.bins.items():
+            counts[(i - lo) // step] += n
+        return [
+            {
+                "from": (lo + k * step) * self.width,
+                "to": (lo + (k + 1) * step) * self.width,
+                "count": count,
+            }
+            for k, count in enumerate(counts)
+        ]
+
+    def to_dict(self):
+        return {"width": self.width, "bins": {str(i): n for i, n in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data["width"])
+        hist.bins = {int(i): n for i, n in data["bins"].items()}
+        return hist
+
+
+def _chave(texto):
+    # Mesma comparação dos filtros da listagem: sem maiúsculas nem acentos
+    return sem_acento(texto) if texto else None
+
+
+class ValorDistribution:
+    """
+    Distribuição de `valor` por cidade/tipo, mantida em memória.
+
+    Para cada par (cidade, tipo), e também para cada cidade, cada tipo e o
+    total, guarda um QuantileSketch e um Histogram, de modo que qualquer
+    combinação de filtros é respondida sem varrer a tabela.
+
+    Gatilhos no banco registram cada mudança de valor em valor_eventos,
+    com um seq crescente, venha a escrita de qualquer processo. A
+    distribuição sabe até que seq já aplicou: parte de um snapshot em
+    disco, mesmo antigo (até `retention`, o tempo que os eventos ficam no
+    banco), e aplica os eventos seguintes. Sem snapshot utilizável, e a
+    cada `max_age`, varre a tabela numa thread em segundo plano e troca o
+    resultado de uma vez; leituras e escritas nunca esperam a varredura
+    segurando o lock.
+    """
+
+    def __init__(self, alpha=0.01, width=10_000, snapshot_path=None,
+                 save_interval=60, max_age=3600, retention=7 * 86400, janela=1000):
+        self.alpha = alpha
+        self.width = width
+        self.snapshot_path = snapshot_path
+        self.save_interval = save_interval
+        self.max_age = max_age
+        self.retention = retention
+        # Eventos com seq logo abaixo do último aplicado podem ter sido
+        # confirmados depois dele: os que não estão em _recentes são
+        # buscados de novo pelo seq enquanto estiverem nesta janela
+        self.janela = janela
+        self.groups = {}
+        self.seq = 0
+        self._recentes = set()
+        self.built_at = None
+        self.synced_at = None
+        self.saved_at = None
+        self._dirty = False
+        self._snapshot_lido = False
+        self._verificada = False
+        self._tarefa = None
+        self._lock = threading.RLock()
+        self._pronta = threading.Event()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def loaded(self):
+        return self.built_at is not None
+
+    def _after_fork(self):
+        self._lock = threading.RLock()
+        pronta, self._pronta = self._pronta, threading.Event()
+        if pronta.is_set():
+            self._pronta.set()
+        # Threads não sobrevivem ao fork
+        self._tarefa = None
+
+    def _keys(self, cidade, tipo):
+        cidade, tipo = _chave(cidade), _chave(tipo)
+        return ((cidade, tipo), (cidade, None), (None, tipo), (None, None))
+
+    def _aplicar(self, groups, cidade, tipo, valor, delta):
+        if valor is None:
+            return
+        valor = float(valor)
+        # Infinity/NaN gravados por outro cliente não cabem em nenhum bucket
+        if not math.isfinite(valor):
+            return
+        for key in self._keys(cidade, tipo):
+            group = groups.get(key)
+            if group is None:
+                if delta < 0:
+                    continue
+                group = (QuantileSketch(self.alpha), Histogram(self.width))
+                groups[key] = group
+            if delta > 0:
+                group[0].add(valor)
+                group[1].add(valor)
+            else:
+                group[0].remove(valor)
+                group[1].remove(valor)
+
+    # Atualização
+
+    def rebuild(self, rows, recentes=(), inicio=None):
+        """
+        Reconstrói a partir de (cidade, tipo, valor) de todas as linhas,
+        lidas junto com `recentes`, os seqs de eventos já refletidos nelas.
+        Os grupos são montados fora do lock e trocados de uma vez.
+        """
+        inicio = inicio or time.time()
+        groups = {}
+        for cidade, tipo, valor in rows:
+            self._aplicar(groups, cidade, tipo, valor, 1)
+        with self._lock:
+            self.groups = groups
+            self.seq = max(recentes, default=0)
+            self._recentes = set(recentes)
+            self.built_at = self.synced_at = inicio
+            self._dirty = True
+        self._pronta.set()
+        self.save()
+
+    def sincronizar(self, repo):
+        """
+        Aplica os eventos de repo.eventos_valor() ainda não vistos, de
+        qualquer processo. Retorna quantos foram aplicados.
+        """
+        if not self.loaded:
+            return 0
+        if time.time() - self.synced_at > self.retention:
+            # Eventos desse intervalo podem ter sido podados
+            self._em_segundo_plano(self._reconstruir, repo)
+            return 0
+        inicio = time.time()
+        aplicados = 0
+        while True:
+            with self._lock:
+                desde = self.seq
+                faltantes = self._faltantes()
+            # Só o que vem depois do último seq aplicado e os poucos seqs da
+            # janela ainda não vistos: sem escritas novas, nada volta do banco
+            eventos = repo.eventos_valor(desde, faltantes)
+            with self._lock:
+                # Se uma reconstrução trocou os grupos por outros com seq
+                # menor enquanto os eventos eram lidos, relê a partir dele
+                if self.seq < desde:
+                    continue
+                piso = self.seq - self.janela
+                for seq, cidade, tipo, valor, delta in eventos:
+                    if seq <= piso or seq in self._recentes:
+                        continue
+                    self._recentes.add(seq)
+                    self._aplicar(self.groups, cidade, tipo, valor, delta)
+                    self.seq = max(self.seq, seq)
+                    aplicados += 1
+                piso = self.seq - self.janela
+                self._recentes = {seq for seq in self._recentes if seq > piso}
+                self.synced_at = max(self.synced_at, inicio)
+                self._dirty = self._dirty or aplicados > 0
+                break
+        if aplicados:
+            self.save_if_due()
+        return aplicados
+
+    def _faltantes(self):
+        """Seqs da janela abaixo do último aplicado que ainda não chegaram."""
+        inicio = max(self.seq - self.janela, 0) + 1
+        return [seq for seq in range(inicio, self.seq + 1) if seq not in self._recentes]
+
+    def ensure(self, repo):
+        """
+        Não bloqueia: na primeira chamada lê o snapshot (só o arquivo) e
+        agenda em segundo plano a aplicação dos eventos desde ele; sem
+        snapshot, ou com a última varredura mais velha que max_age, agenda
+        uma varredura completa.
+        """
+        with self._lock:
+            if not self._snapshot_lido:
+                self._snapshot_lido = True
+                self.load()
+            if not self.loaded or time.time() - self.built_at > self.max_age:
+                self._em_segundo_plano(self._reconstruir, repo)
+            elif not self._verificada:
+                self._em_segundo_plano(self._verificar, repo)
+        return self
+
+    def wait(self, timeout=None):
+        """Espera a primeira distribuição ficar pronta. True se ficou."""
+        return self._pronta.wait(timeout)
+
+    def _reconstruir(self, repo):
+        inicio = time.time()
+        recentes, linhas = repo.valores(janela=self.janela)
+        self.rebuild(linhas, recentes, inicio)
+        self._verificada = True
+        repo.podar_eventos_valor(self.retention)
+
+    def _verificar(self, repo):
+        """Após carregar um snapshot: aplica os eventos e confere o total."""
+        self.sincronizar(repo)
+        if repo.count_valores() != self._total():
+            # Ex.: TRUNCATE ou carga que não passou pelos gatilhos
+            self._reconstruir(repo)
+        self._verificada = True
+
+    def _em_segundo_plano(self, alvo, repo):
+        with self._lock:
+            if self._tarefa is not None and self._tarefa.is_alive():
+                return
+            self._tarefa = threading.Thread(
+                target=self._executar, args=(alvo, repo),
+                name="valor-distribution", daemon=True,
+            )
+            self._tarefa.start()
+
+    def _executar(self, alvo, repo):
+        try:
+            alvo(repo)
+        except Exception as e:
+            print(f"Error updating valor distribution: {e}")
+        finally:
+            # Conexão aberta só para esta thread
+            repo.reset()
+
+    def _total(self):
+        group = self.groups.get((None, None))
+        return group[0].count if group else 0
+
+    # Consulta
+
+    def summary(self, cidade=None, tipo=None, buckets=10):
+        with self._lock:
+            group = self.groups.get((_chave(cidade), _chave(tipo)))
+            if group is None:
+                sketch, hist = QuantileSketch(self.alpha), Histogram(self.width)
+            else:
+                sketch, hist = group
+            return {
+                "count": sketch.count,
+                "min": _arredondar(sketch.quantile(0)),
+                "max": _arredondar(sketch.quantile(1)),
+                "quantiles": {
+                    f"p{int(q * 100)}": _arredondar(sketch.quantile(q))
+                    for q in (0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+                },
+                "histogram": hist.rebin(buckets),
+                "error_bounds": {
+                    "quantiles_relative_error": self.alpha,
+                    "histogram_counts": "exact",
+                    "histogram_edge_resolution": self.width,
+                },
+                "as_of": datetime.datetime.fromtimestamp(
+                    self.synced_at, datetime.timezone.utc
+                ).isoformat() if self.synced_at else None,
+            }
+
+    # Persistência
+
+    def save_if_due(self):
+        if self.saved_at is None or time.time() - self.saved_at >= self.save_interval:
+            self.save()
+
+    def save(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "formato": FORMATO_SNAPSHOT,
+                "alpha": self.alpha,
+                "width": self.width,
+                "built_at": self.built_at,
+                "synced_at": self.synced_at,
+                "seq": self.seq,
+                "recentes": sorted(self._recentes),
+                "groups": [
+                    [cidade, tipo, sketch.to_dict(), hist.to_dict()]
+                    for (cidade, tipo), (sketch, hist) in self.groups.items()
+                ],
+            }
+            self._dirty = False
+            self.saved_at = time.time()
+        # Escrita atômica: vários workers podem salvar o mesmo arquivo
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.snapshot_path)
+
+    def load(self):
+        """
+        Carrega o snapshot se existir e ainda puder ser completado pelos
+        eventos do banco (sincronizado há menos de `retention`). Os eventos
+        posteriores são aplicados depois, por sincronizar(). Retorna True
+        se usou o snapshot.
+        """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (
+            data.get("formato") != FORMATO_SNAPSHOT
+            or data.get("alpha") != self.alpha
+            or data.get("width") != self.width
+            or "seq" not in data
+            or time.time() - data.get("synced_at", 0) > self.retention
+        ):
+            return False
+        with self._lock:
+            self.groups = {
+                (cidade, tipo): (QuantileSketch.from_dict(s), Histogram.from_dict(h))
+                for cidade, tipo, s, h in data["groups"]
+            }
+            self.seq = data["seq"]
+            self._recentes = set(data["recentes"])
+            self.built_at = data["built_at"]
+            self.synced_at = data["synced_at"]
+            self.saved_at = time.time()
+            self._dirty = False
+        self._pronta.set()
+        return True
+
+
+def _arredondar(valor):
+    return None if valor is None else round(valor, 2)
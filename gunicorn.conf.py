@@ -0,0 +1,59 @@
+"""
+Configuração do Gunicorn para produção.
+
+    uv run gunicorn -c gunicorn.conf.py
+
+Sobe WEB_CONCURRENCY processos (padrão: número de CPUs), cada um com
+WEB_THREADS threads. Cada worker importa a aplicação depois do fork e abre
+as próprias conexões com o banco.
+
+Sinais enviados ao processo mestre:
+    TERM  encerramento gracioso: para de aceitar conexões e espera as
+          requisições em andamento por até GRACEFUL_TIMEOUT segundos
+    HUP   reload sem downtime: sobe workers novos (com o código e a
+          configuração atuais) e só então encerra os antigos
+    USR2  troca do binário/ambiente: sobe um novo mestre ao lado do antigo
+          (em seguida envie TERM ao mestre antigo)
+"""
+
+import os
+
+wsgi_app = "main:app"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", 4))
+
+# Sem preload: o app é importado em cada worker, então nada aberto pelo
+# mestre é compartilhado, e o HUP recarrega o código da aplicação.
+preload_app = False
+
+timeout = int(os.getenv("WORKER_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+# Recicla workers periodicamente (com jitter para não reciclarem juntos)
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("ACCESS_LOG", "-") or None
+
+
+def post_worker_init(worker):
+    """Aquece conexão e cache antes de o worker aceitar requisições."""
+    from main import warm_up
+
+    if not warm_up(worker.wsgi):
+        worker.log.warning("Warm-up falhou: banco indisponível; /ready retornará 503")
+
+
+def worker_exit(server, worker):
+    """
+    Salva a distribuição de valores e fecha as conexões do worker depois
+    de drenar as requisições.
+    """
+    app = getattr(worker, "wsgi", None)
+    if app is not None:
+        app.extensions["imoveis_distribuicao"].save()
+        app.extensions["imoveis_repo"].close_all()
@@ -1,35 +1,224 @@
-from flask import Flask, jsonify, request, url_for
-from db import get_db_connection
+from flask import Blueprint, Flask, current_app, jsonify, request, url_for
+from mysql.connector import Error
+from mysql.connector.errors import InterfaceError, OperationalError
+from cache import QueryCache
+from db import DatabaseUnavailable
+from distribution import ValorDistribution
+from query_plan import ListagemSpec, ParametroInvalido, parse_listagem
+from repository import criar_repositorio, normalizar_cep
 import math
-
-app = Flask(__name__)
-conn = get_db_connection()
+import os
+import sqlite3
+import threading
 
 # API Version
 API_VERSION = "v1"
 BASE_URL = f"/api/{API_VERSION}"
 
+api = Blueprint("api", __name__)
+
+
+def create_app(config=None):
+    """
+    Cria a aplicação. Nenhuma conexão com o banco é aberta aqui: ela é
+    criada na primeira requisição (ou no warm-up) de cada thread.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        DATABASE_BACKEND=os.getenv("DATABASE_BACKEND", "mysql"),
+        DB_CONNECT_RETRIES=int(os.getenv("DB_CONNECT_RETRIES", 3)),
+        DB_RETRY_BACKOFF=float(os.getenv("DB_RETRY_BACKOFF", 0.5)),
+        CACHE_TTL=float(os.getenv("CACHE_TTL", 0)),
+        WARMUP_PAGES=int(os.getenv("WARMUP_PAGES", 0)),
+        WARMUP_PER_PAGE=int(os.getenv("WARMUP_PER_PAGE", 10)),
+        DISTRIBUTION_ALPHA=float(os.getenv("DISTRIBUTION_ALPHA", 0.01)),
+        DISTRIBUTION_BUCKET_WIDTH=float(os.getenv("DISTRIBUTION_BUCKET_WIDTH", 10_000)),
+        DISTRIBUTION_SNAPSHOT=os.getenv("DISTRIBUTION_SNAPSHOT", "valor_distribution.json"),
+        DISTRIBUTION_SAVE_INTERVAL=float(os.getenv("DISTRIBUTION_SAVE_INTERVAL", 60)),
+        DISTRIBUTION_MAX_AGE=float(os.getenv("DISTRIBUTION_MAX_AGE", 3600)),
+        DISTRIBUTION_RETENTION=float(os.getenv("DISTRIBUTION_RETENTION", 7 * 86400)),
+        DISTRIBUTION_WAIT=float(os.getenv("DISTRIBUTION_WAIT", 5)),
+    )
+    if config:
+        app.config.update(config)
+
+    app.extensions["imoveis_repo"] = criar_repositorio(
+        app.config["DATABASE_BACKEND"],
+        retries=app.config["DB_CONNECT_RETRIES"],
+        backoff=app.config["DB_RETRY_BACKOFF"],
+    )
+    app.extensions["imoveis_cache"] = QueryCache(ttl=app.config["CACHE_TTL"])
+    if app.config["WARMUP_PAGES"] > 0 and app.config["CACHE_TTL"] <= 0:
+        print(
+            "Warning: WARMUP_PAGES is set but CACHE_TTL is 0 (cache disabled);"
+            " no pages will be prefetched"
+        )
+    app.extensions["imoveis_distribuicao"] = ValorDistribution(
+        alpha=app.config["DISTRIBUTION_ALPHA"],
+        width=app.config["DISTRIBUTION_BUCKET_WIDTH"],
+        snapshot_path=app.config["DISTRIBUTION_SNAPSHOT"],
+        save_interval=app.config["DISTRIBUTION_SAVE_INTERVAL"],
+        max_age=app.config["DISTRIBUTION_MAX_AGE"],
+        retention=app.config["DISTRIBUTION_RETENTION"],
+    )
+    warmup = {"done": False, "lock": threading.Lock()}
+    app.extensions["imoveis_warmup"] = warmup
+    os.register_at_fork(after_in_child=lambda: warmup.update(lock=threading.Lock()))
+
+    app.register_blueprint(api)
+
+    # Caminhos das rotas resolvidos uma vez; os links são montados por
+    # concatenação com a raiz da requisição
+    with app.test_request_context():
+        lista = url_for("api.get_imoveis")
+    app.extensions["imoveis_rotas"] = {"lista": lista, "item": lista + "/"}
+    return app
+
+
+def warm_up(app):
+    """
+    Abre a conexão e, com o cache ligado (CACHE_TTL > 0), pré-carrega nele
+    as páginas mais acessadas da listagem (ordem padrão) e os totais, antes
+    de o worker receber tráfego.
+    A distribuição de valores só lê o snapshot aqui; eventos e varredura
+    ficam em segundo plano. Retorna True quando o worker está pronto.
+    """
+    state = app.extensions["imoveis_warmup"]
+    with state["lock"]:
+        if state["done"]:
+            return True
+        with app.app_context():
+            if not app.extensions["imoveis_repo"].ping():
+                return False
+            try:
+                # Sem cache, as consultas seriam feitas e descartadas
+                if app.config["CACHE_TTL"] > 0:
+                    _contar_imoveis()
+                    per_page = app.config["WARMUP_PER_PAGE"]
+                    for page in range(1, app.config["WARMUP_PAGES"] + 1):
+                        _listar_imoveis(ListagemSpec(page=page, per_page=per_page))
+                app.extensions["imoveis_distribuicao"].ensure(
+                    app.extensions["imoveis_repo"]
+                )
+            except (DatabaseUnavailable, Error, sqlite3.Error):
+                app.extensions["imoveis_repo"].reset()
+                return False
+        state["done"] = True
+        return True
+
+
+def _repo():
+    return current_app.extensions["imoveis_repo"]
+
+
+def _invalidar_cache():
+    current_app.extensions["imoveis_cache"].clear()
+
+
+def _distribuicao():
+    """
+    Distribuição de valores com as escritas de todos os workers aplicadas,
+    ou None se a primeira varredura não terminar em DISTRIBUTION_WAIT.
+    """
+    dist = current_app.extensions["imoveis_distribuicao"]
+    repo = _repo()
+    dist.ensure(repo)
+    if not dist.wait(current_app.config["DISTRIBUTION_WAIT"]):
+        return None
+    dist.sincronizar(repo)
+    return dist
+
+
+def _contar_imoveis(spec=ListagemSpec()):
+    """Total de imóveis para os filtros do spec, passando pelo cache."""
+    cache = current_app.extensions["imoveis_cache"]
+    key = ("total",) + spec.filtros
+    total = cache.get(key)
+    if total is None:
+        total = _repo().count(*spec.filtros)
+        cache.set(key, total)
+    return total
+
+
+def _listar_imoveis(spec):
+    """Uma página da listagem, passando pelo cache. Retorna cópias das linhas."""
+    cache = current_app.extensions["imoveis_cache"]
+    rows = cache.get(spec)
+    if rows is None:
+        rows = tuple(
+            _repo().list(
+                spec.tipo, spec.cidade, spec.sort, spec.order, spec.page,
+                spec.per_page, spec.data_inicio, spec.data_fim, spec.bairro,
+                spec.cep,
+            )
+        )
+        cache.set(spec, rows)
+    return [dict(row) for row in rows]
+
+
+def _raiz():
+    # url_root já inclui o SCRIPT_NAME, como o url_for(_external=True)
+    return request.url_root[:-1]
+
+
+def _links_imovel(id, raiz=None):
+    url = f"{raiz or _raiz()}{current_app.extensions['imoveis_rotas']['item']}{id}"
+    return {"self": url, "update": url, "delete": url}
+
+
+@api.errorhandler(ParametroInvalido)
+def parametro_invalido(error):
+    return jsonify({"error": str(error)}), 400
+
+
+@api.errorhandler(DatabaseUnavailable)
+def database_unavailable(error):
+    return jsonify({"error": "Banco de dados indisponível"}), 503
+
 
-@app.route("/")
+@api.errorhandler(InterfaceError)
+@api.errorhandler(OperationalError)
+@api.errorhandler(sqlite3.OperationalError)
+def database_connection_lost(error):
+    # Conexão caiu (ou banco travado): descarta para que a próxima
+    # requisição reconecte
+    _repo().reset()
+    return jsonify({"error": "Banco de dados indisponível"}), 503
+
+
+@api.route("/health")
+def health():
+    """Liveness: o processo está de pé, sem tocar no banco"""
+    return jsonify({"status": "ok"})
+
+
+@api.route("/ready")
+def ready():
+    """Readiness: banco acessível e warm-up concluído"""
+    app = current_app._get_current_object()
+    if warm_up(app) and app.extensions["imoveis_repo"].ping():
+        return jsonify({"status": "ready"})
+    return jsonify({"status": "unavailable"}), 503
+
+
+@api.route("/")
 def home():
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM imoveis;")
-    count = cursor.fetchone()[0]
+    count = _contar_imoveis()
     return jsonify(
         {
             "message": "API is running",
             "version": API_VERSION,
             "imoveis_count": count,
             "_links": {
-                "self": url_for("home", _external=True),
-                "imoveis": url_for("get_imoveis", _external=True),
-                "docs": url_for("api_docs", _external=True),
+                "self": url_for("api.home", _external=True),
+                "imoveis": url_for("api.get_imoveis", _external=True),
+                "docs": url_for("api.api_docs", _external=True),
             },
         }
     )
 
 
-@app.route(f"{BASE_URL}/docs")
+@api.route(f"{BASE_URL}/docs")
 def api_docs():
     """Documentação da API"""
     return jsonify(
@@ -43,6 +232,10 @@ def api_docs():
                 "POST /api/v1/imoveis": "Cria um novo imóvel",
                 "PUT /api/v1/imoveis/{id}": "Atualiza um imóvel existente",
                 "DELETE /api/v1/imoveis/{id}": "Remove um imóvel",
+                "GET /api/v1/imoveis/valor/distribution": "Quantis e histograma de valor por cidade/tipo",
+                "GET /api/v1/localidades": "Cidades e bairros com a contagem de imóveis",
+                "GET /health": "Liveness: o processo está respondendo",
+                "GET /ready": "Readiness: banco acessível e cache aquecido",
             },
             "query_parameters": {
                 "page": "Número da página (padrão: 1)",
@@ -51,155 +244,167 @@ def api_docs():
                 "cidade": "Filtrar por cidade",
                 "sort": "Campo para ordenação (id, valor, data_aquisicao)",
                 "order": "Direção da ordenação (asc, desc)",
+                "data_inicio": "Adquiridos a partir desta data (AAAA-MM-DD)",
+                "data_fim": "Adquiridos até esta data, inclusive (AAAA-MM-DD)",
+                "bairro": "Filtrar por bairro (junto com cidade)",
+                "cep": "Prefixo do CEP, só dígitos (ex.: 851 para 851xx-xxx)",
+                "buckets": "Faixas do histograma em /valor/distribution (padrão: 10, máximo: 100)",
             },
         }
     )
 
 
-@app.route(f"{BASE_URL}/imoveis", methods=["GET"])
+@api.route(f"{BASE_URL}/imoveis", methods=["GET"])
 def get_imoveis():
     """
     Lista todos os imóveis com paginação, filtros e ordenação.
     Ex:
         /api/v1/imoveis?tipo=casa&page=1&per_page=10
         /api/v1/imoveis?cidade=São Paulo&sort=valor&order=desc
+        /api/v1/imoveis?data_inicio=2020-01-01&data_fim=2020-12-31
+        /api/v1/imoveis?cep=851
+        /api/v1/imoveis?cidade=Recife&bairro=Boa Viagem
     """
-    # Parâmetros de paginação
-    page = int(request.args.get("page", 1))
-    per_page = min(int(request.args.get("per_page", 10)), 100)  # Máximo 100 por página
-
-    # Parâmetros de filtro
-    tipo = request.args.get("tipo")
-    cidade = request.args.get("cidade")
-
-    # Parâmetros de ordenação
-    sort = request.args.get("sort", "id")
-    order = request.args.get("order", "asc")
-
-    # Validar campos de ordenação
-    valid_sort_fields = ["id", "valor", "data_aquisicao", "cidade", "tipo"]
-    if sort not in valid_sort_fields:
-        return jsonify(
-            {
-                "error": f"Campo de ordenação inválido. Use: {', '.join(valid_sort_fields)}"
-            }
-        ), 400
+    spec = parse_listagem(request.args)
+    page = spec.page
 
-    if order not in ["asc", "desc"]:
-        return jsonify(
-            {"error": "Direção de ordenação inválida. Use: asc ou desc"}
-        ), 400
-
-    cursor = conn.cursor(dictionary=True)
-
-    # Construir query base
-    where_conditions = []
-    params = []
-
-    if tipo:
-        where_conditions.append("LOWER(tipo) = LOWER(%s)")
-        params.append(tipo)
-
-    if cidade:
-        where_conditions.append("cidade = %s")
-        params.append(cidade)
-
-    where_clause = (
-        " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-    )
-
-    # Contar total de registros
-    count_query = f"SELECT COUNT(*) as total FROM imoveis{where_clause}"
-    cursor.execute(count_query, params)
-    total = cursor.fetchone()["total"]
-
-    # Calcular paginação
-    total_pages = math.ceil(total / per_page)
-    offset = (page - 1) * per_page
-
-    # Query principal com paginação e ordenação
-    query = f"""
-    SELECT * FROM imoveis{where_clause}
-    ORDER BY {sort} {order.upper()}
-    LIMIT %s OFFSET %s
-    """
-    cursor.execute(query, params + [per_page, offset])
-    imoveis = cursor.fetchall()
+    total = _contar_imoveis(spec)
+    total_pages = math.ceil(total / spec.per_page)
+    imoveis = _listar_imoveis(spec)
 
     # Adicionar links HATEOAS
+    raiz = _raiz()
     for imovel in imoveis:
-        imovel["_links"] = {
-            "self": url_for("get_imovel", id=imovel["id"], _external=True),
-            "update": url_for("update_imovel", id=imovel["id"], _external=True),
-            "delete": url_for("delete_imovel", id=imovel["id"], _external=True),
-        }
+        imovel["_links"] = _links_imovel(imovel["id"], raiz)
+
+    base = raiz + current_app.extensions["imoveis_rotas"]["lista"]
 
     # Resposta com metadados de paginação
     response = {
         "data": imoveis,
         "pagination": {
             "page": page,
-            "per_page": per_page,
+            "per_page": spec.per_page,
             "total": total,
             "total_pages": total_pages,
             "has_next": page < total_pages,
             "has_prev": page > 1,
         },
         "_links": {
-            "self": url_for("get_imoveis", _external=True, **request.args),
-            "first": url_for(
-                "get_imoveis",
+            "self": spec.link(base, page),
+            "first": spec.link(base, 1),
+            "last": spec.link(base, total_pages) if total_pages > 0 else None,
+            "next": spec.link(base, page + 1) if page < total_pages else None,
+            "prev": spec.link(base, page - 1) if page > 1 else None,
+        },
+    }
+
+    return jsonify(response)
+
+
+@api.route(f"{BASE_URL}/imoveis/valor/distribution", methods=["GET"])
+def get_valor_distribution():
+    """
+    Distribuição de valor (quantis e histograma) por cidade e/ou tipo,
+    servida de sketches em memória, sem varrer a tabela.
+    Ex:
+        /api/v1/imoveis/valor/distribution?cidade=São Paulo&tipo=casa&buckets=20
+    """
+    cidade = request.args.get("cidade") or None
+    tipo = request.args.get("tipo") or None
+    try:
+        buckets = int(request.args.get("buckets", 10))
+    except ValueError:
+        buckets = 0
+    if not 1 <= buckets <= 100:
+        return jsonify({"error": "buckets deve ser um inteiro entre 1 e 100"}), 400
+
+    dist = _distribuicao()
+    if dist is None:
+        return jsonify({"error": "Distribuição de valores em construção"}), 503
+
+    response = {
+        "filters": {"cidade": cidade, "tipo": tipo, "buckets": buckets},
+        **dist.summary(cidade, tipo, buckets),
+        "_links": {
+            "self": url_for("api.get_valor_distribution", _external=True, **request.args),
+            "imoveis": url_for(
+                "api.get_imoveis",
                 _external=True,
-                page=1,
-                **{k: v for k, v in request.args.items() if k != "page"},
+                **{k: v for k, v in (("cidade", cidade), ("tipo", tipo)) if v},
             ),
-            "last": url_for(
-                "get_imoveis",
-                _external=True,
-                page=total_pages,
-                **{k: v for k, v in request.args.items() if k != "page"},
-            )
-            if total_pages > 0
-            else None,
-            "next": url_for(
-                "get_imoveis",
-                _external=True,
-                page=page + 1,
-                **{k: v for k, v in request.args.items() if k != "page"},
-            )
-            if page < total_pages
-            else None,
-            "prev": url_for(
-                "get_imoveis",
-                _external=True,
-                page=page - 1,
-                **{k: v for k, v in request.args.items() if k != "page"},
-            )
-            if page > 1
-            else None,
         },
     }
-
     return jsonify(response)
 
 
-@app.route(f"{BASE_URL}/imoveis/<int:id>", methods=["GET"])
+def _localidades(cidade=None):
+    """Contagens por cidade/bairro, passando pelo cache."""
+    cache = current_app.extensions["imoveis_cache"]
+    key = ("localidades", cidade)
+    rows = cache.get(key)
+    if rows is None:
+        rows = tuple(_repo().localidades(cidade))
+        cache.set(key, rows)
+    return rows
+
+
+@api.route(f"{BASE_URL}/localidades", methods=["GET"])
+def get_localidades():
+    """
+    Cidades e seus bairros com a quantidade de imóveis, lidas da tabela
+    localidades (mantida pelo banco a cada escrita), sem varrer imoveis.
+    Ex:
+        /api/v1/localidades
+        /api/v1/localidades?cidade=Recife
+    """
+    cidade = request.args.get("cidade") or None
+    raiz = _raiz()
+    base = raiz + current_app.extensions["imoveis_rotas"]["lista"]
+
+    cidades = {}
+    for row in _localidades(cidade):
+        atual = cidades.get(row["cidade"].casefold())
+        if atual is None:
+            atual = {
+                "cidade": row["cidade"],
+                "total": 0,
+                "bairros": [],
+                "_links": {
+                    "imoveis": ListagemSpec(cidade=row["cidade"]).link(base, 1),
+                },
+            }
+            cidades[row["cidade"].casefold()] = atual
+        atual["total"] += row["total"]
+        bairro = {"bairro": row["bairro"] or None, "total": row["total"]}
+        if row["bairro"]:
+            spec = ListagemSpec(cidade=row["cidade"], bairro=row["bairro"])
+            bairro["_links"] = {"imoveis": spec.link(base, 1)}
+        atual["bairros"].append(bairro)
+
+    return jsonify(
+        {
+            "data": list(cidades.values()),
+            "total": sum(c["total"] for c in cidades.values()),
+            "_links": {
+                "self": raiz + request.full_path.rstrip("?"),
+                "imoveis": base,
+            },
+        }
+    )
+
+
+@api.route(f"{BASE_URL}/imoveis/<int:id>", methods=["GET"])
 def get_imovel(id):
     """Lista um imóvel específico pelo ID"""
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM imoveis WHERE id = %s;", (id,))
-    imovel = cursor.fetchone()
+    imovel = _repo().get(id)
     if imovel:
-        imovel["_links"] = {
-            "self": url_for("get_imovel", id=id, _external=True),
-            "update": url_for("update_imovel", id=id, _external=True),
-            "delete": url_for("delete_imovel", id=id, _external=True),
-        }
+        imovel["_links"] = _links_imovel(id)
         return jsonify(imovel)
     return jsonify({"error": "Imóvel não encontrado"}), 404
 
 
-@app.route(f"{BASE_URL}/imoveis", methods=["POST"])
+@api.route(f"{BASE_URL}/imoveis", methods=["POST"])
 def add_imovel():
     """Adiciona um novo imóvel"""
     data = request.get_json()
@@ -220,44 +425,28 @@ def add_imovel():
     # Validação de tipos de dados
     try:
         valor = float(data.get("valor"))
+        # float() e o JSON do Flask aceitam Infinity e NaN
+        if not math.isfinite(valor):
+            return jsonify({"error": "Valor deve ser um número válido"}), 400
         if valor < 0:
             return jsonify({"error": "Valor deve ser positivo"}), 400
     except (ValueError, TypeError):
         return jsonify({"error": "Valor deve ser um número válido"}), 400
 
-    cursor = conn.cursor()
-    sql = """
-    INSERT INTO imoveis (logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
-    """
-    values = (
-        data.get("logradouro"),
-        data.get("tipo_logradouro"),
-        data.get("bairro"),
-        data.get("cidade"),
-        data.get("cep"),
-        data.get("tipo"),
-        valor,
-        data.get("data_aquisicao"),
-    )
-
-    cursor.execute(sql, values)
-    conn.commit()
-    new_id = cursor.lastrowid
+    # CEP gravado só com dígitos, para servir a busca por prefixo
+    novo = {**data, "valor": valor, "cep": normalizar_cep(data.get("cep"))}
+    new_id = _repo().add(novo)
+    _invalidar_cache()
     return jsonify(
         {
             "message": "Imóvel adicionado com sucesso",
             "id": new_id,
-            "_links": {
-                "self": url_for("get_imovel", id=new_id, _external=True),
-                "update": url_for("update_imovel", id=new_id, _external=True),
-                "delete": url_for("delete_imovel", id=new_id, _external=True),
-            },
+            "_links": _links_imovel(new_id),
         }
     ), 201
 
 
-@app.route(f"{BASE_URL}/imoveis/<int:id>", methods=["PUT"])
+@api.route(f"{BASE_URL}/imoveis/<int:id>", methods=["PUT"])
 def update_imovel(id):
     """Atualiza um imóvel existente"""
     data = request.get_json()
@@ -266,54 +455,40 @@ def update_imovel(id):
     if "valor" in data:
         try:
             valor = float(data.get("valor"))
+            if not math.isfinite(valor):
+                return jsonify({"error": "Valor deve ser um número válido"}), 400
             if valor < 0:
                 return jsonify({"error": "Valor deve ser positivo"}), 400
         except (ValueError, TypeError):
             return jsonify({"error": "Valor deve ser um número válido"}), 400
 
-    cursor = conn.cursor()
-    sql = """
-    UPDATE imoveis
-    SET logradouro = %s, tipo_logradouro = %s, bairro = %s, cidade = %s, cep = %s, tipo = %s, valor = %s, data_aquisicao = %s
-    WHERE id = %s;
-    """
-    values = (
-        data.get("logradouro"),
-        data.get("tipo_logradouro"),
-        data.get("bairro"),
-        data.get("cidade"),
-        data.get("cep"),
-        data.get("tipo"),
-        data.get("valor"),
-        data.get("data_aquisicao"),
-        id,
-    )
-    cursor.execute(sql, values)
-    conn.commit()
-    if cursor.rowcount:
+    data = {**data, "cep": normalizar_cep(data.get("cep"))}
+
+    updated = _repo().update(id, data)
+    _invalidar_cache()
+    if updated:
         return jsonify(
             {
                 "message": "Imóvel atualizado com sucesso",
-                "_links": {
-                    "self": url_for("get_imovel", id=id, _external=True),
-                    "update": url_for("update_imovel", id=id, _external=True),
-                    "delete": url_for("delete_imovel", id=id, _external=True),
-                },
+                "_links": _links_imovel(id),
             }
         ), 200
     return jsonify({"error": "Imóvel não encontrado"}), 404
 
 
-@app.route(f"{BASE_URL}/imoveis/<int:id>", methods=["DELETE"])
+@api.route(f"{BASE_URL}/imoveis/<int:id>", methods=["DELETE"])
 def delete_imovel(id):
     """Remove um imóvel existente"""
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM imoveis WHERE id = %s;", (id,))
-    conn.commit()
-    if cursor.rowcount:
+    deleted = _repo().delete(id)
+    _invalidar_cache()
+    if deleted:
         return "", 204
     return jsonify({"error": "Imóvel não encontrado"}), 404
 
 
+app = create_app()
+
+
 if __name__ == "__main__":
+    warm_up(app)
     app.run(debug=True)
@@ -0,0 +1,140 @@
+"""
+Manutenção das partições e do arquivo de imóveis.
+
+    python maintenance.py partition --granularity year --ahead 1
+    python maintenance.py archive --years 5
+    python maintenance.py archive --before 2018-01-01
+    python maintenance.py status
+    python maintenance.py backfill
+    python maintenance.py prune-events
+
+`partition` cria as partições por data_aquisicao (MySQL) ou, se a tabela
+já for particionada, acrescenta as dos próximos períodos; rode-o
+periodicamente (cron) para nunca depender de p_max. `archive` move para
+imoveis_arquivo os imóveis adquiridos antes da data de corte; no MySQL,
+o corte é arredondado para baixo até o limite de uma partição, que é
+movida inteira. Os imóveis arquivados continuam acessíveis por ID.
+`backfill` deixa só dígitos nos CEPs antigos, reconstrói a tabela
+localidades e, no SQLite, recria com a collation sem_acento as tabelas
+criadas com COLLATE NOCASE; rode-o uma vez em bancos criados antes dessas
+mudanças.
+`prune-events` apaga de valor_eventos o que for mais antigo que
+DISTRIBUTION_RETENTION; agende-o no cron, porque os workers só podam
+depois de uma varredura completa da distribuição.
+"""
+
+import argparse
+import datetime
+import os
+
+from repository import criar_repositorio
+
+
+def corte(args):
+    """Data de corte do arquivamento: --before ou hoje menos --years anos."""
+    if args.before:
+        return datetime.date.fromisoformat(args.before)
+    hoje = datetime.date.today()
+    return datetime.date(hoje.year - args.years, 1, 1)
+
+
+def partition(args):
+    repo = criar_repositorio()
+    repo.criar_schema()
+    criadas = repo.preparar_particoes(args.granularity, args.start, args.ahead)
+    if criadas:
+        print(f"Partições criadas: {', '.join(criadas)}")
+    else:
+        print("Nenhuma partição nova")
+    repo.close_all()
+
+
+def archive(args):
+    repo = criar_repositorio()
+    repo.criar_schema()
+    antes_de = corte(args)
+    movidos = repo.arquivar(antes_de)
+    print(f"{movidos} imóveis adquiridos antes de {antes_de.isoformat()} arquivados")
+    repo.close_all()
+
+
+def status(args):
+    repo = criar_repositorio()
+    repo.criar_schema()
+    contagens = repo.contagens()
+    print(f"imoveis: {contagens['imoveis']}")
+    print(f"imoveis_arquivo: {contagens['imoveis_arquivo']}")
+    for nome, limite, linhas in repo.particoes():
+        limite = limite.isoformat() if limite else "MAXVALUE"
+        print(f"  {nome:<10} < {limite:<10} ~{linhas} linhas")
+    repo.close_all()
+
+
+def backfill(args):
+    repo = criar_repositorio()
+    repo.criar_schema()
+    for tabela in repo.migrar_collation():
+        print(f"{tabela} recriada com a collation sem_acento")
+    print(f"{repo.normalizar_ceps()} CEPs normalizados")
+    repo.recalcular_localidades()
+    print(f"{len(repo.localidades())} localidades (cidade/bairro) recalculadas")
+    repo.close_all()
+
+
+def prune_events(args):
+    repo = criar_repositorio()
+    repo.criar_schema()
+    removidos = repo.podar_eventos_valor(args.retention)
+    print(f"{removidos} eventos de valor com mais de {args.retention:.0f}s removidos")
+    repo.close_all()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Partições e arquivo de imóveis")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_part = sub.add_parser("partition", help="Cria/estende as partições por data")
+    p_part.add_argument(
+        "--granularity",
+        choices=("year", "month"),
+        default=os.getenv("PARTITION_GRANULARITY", "year"),
+    )
+    p_part.add_argument(
+        "--start", type=int, default=int(os.getenv("PARTITION_START", 2010)),
+        help="Primeiro ano com partição própria",
+    )
+    p_part.add_argument(
+        "--ahead", type=int, default=int(os.getenv("PARTITION_AHEAD", 1)),
+        help="Períodos futuros criados com antecedência",
+    )
+    p_part.set_defaults(func=partition)
+
+    p_arq = sub.add_parser("archive", help="Move imóveis antigos para o arquivo")
+    grupo = p_arq.add_mutually_exclusive_group()
+    grupo.add_argument("--before", help="Data de corte (AAAA-MM-DD)")
+    grupo.add_argument(
+        "--years", type=int, default=int(os.getenv("ARCHIVE_AFTER_YEARS", 5)),
+        help="Arquiva o que tiver mais de N anos completos",
+    )
+    p_arq.set_defaults(func=archive)
+
+    p_status = sub.add_parser("status", help="Linhas por tabela e por partição")
+    p_status.set_defaults(func=status)
+
+    p_back = sub.add_parser("backfill", help="Normaliza CEPs e recalcula localidades")
+    p_back.set_defaults(func=backfill)
+
+    p_prune = sub.add_parser("prune-events", help="Remove eventos de valor antigos")
+    p_prune.add_argument(
+        "--retention", type=float,
+        default=float(os.getenv("DISTRIBUTION_RETENTION", 7 * 86400)),
+        help="Mantém os eventos dos últimos N segundos",
+    )
+    p_prune.set_defaults(func=prune_events)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
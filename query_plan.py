@@ -0,0 +1,138 @@
+import datetime
+import functools
+import urllib.parse
+from collections import namedtuple
+
+from repository import SORT_FIELDS, normalizar_cep
+
+PER_PAGE_MAX = 100
+# Maior deslocamento aceito; além disso o OFFSET estoura nos bancos
+OFFSET_MAX = 2**31 - 1
+
+
+class ParametroInvalido(ValueError):
+    """Parâmetro de consulta malformado ou fora do permitido (HTTP 400)."""
+
+
+_ListagemSpec = namedtuple(
+    "ListagemSpec",
+    (
+        "tipo", "cidade", "data_inicio", "data_fim", "bairro", "cep",
+        "sort", "order", "page", "per_page",
+    ),
+    defaults=(None, None, None, None, None, None, "id", "asc", 1, 10),
+)
+
+
+class ListagemSpec(_ListagemSpec):
+    """
+    Consulta de listagem já validada e normalizada. É imutável e hashable:
+    requisições equivalentes (ex.: `?tipo=` e sem tipo) geram o mesmo spec,
+    que serve direto como chave de cache. Os filtros ausentes são None.
+    """
+
+    __slots__ = ()
+
+    @property
+    def filtros(self):
+        return (
+            self.tipo, self.cidade, self.data_inicio, self.data_fim,
+            self.bairro, self.cep,
+        )
+
+    def pagina(self, page):
+        return self._replace(page=page)
+
+    def link(self, base, page):
+        """URL desta consulta na página `page`, a partir da URL base da rota."""
+        return f"{base}?{_query_base(self.pagina(1))}page={page}"
+
+
+def _inteiro(args, campo, padrao):
+    valor = args.get(campo)
+    if not valor:
+        return padrao
+    try:
+        return int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"{campo} deve ser um número inteiro") from None
+
+
+def _data(args, campo):
+    valor = args.get(campo)
+    if not valor:
+        return None
+    try:
+        return datetime.date.fromisoformat(valor).isoformat()
+    except ValueError:
+        raise ParametroInvalido("Datas inválidas. Use o formato AAAA-MM-DD") from None
+
+
+def _prefixo_cep(args):
+    valor = args.get("cep")
+    if not valor:
+        return None
+    cep = normalizar_cep(valor)
+    if not cep or len(cep) > 8:
+        raise ParametroInvalido("cep deve ter de 1 a 8 dígitos")
+    return cep
+
+
+def parse_listagem(args):
+    """Valida os parâmetros de GET /imoveis e devolve o ListagemSpec."""
+    page = _inteiro(args, "page", 1)
+    if page < 1:
+        raise ParametroInvalido("page deve ser maior ou igual a 1")
+
+    per_page = _inteiro(args, "per_page", 10)
+    if per_page < 1:
+        raise ParametroInvalido("per_page deve ser maior ou igual a 1")
+    per_page = min(per_page, PER_PAGE_MAX)
+    if (page - 1) * per_page > OFFSET_MAX:
+        raise ParametroInvalido(
+            f"page deve ser no máximo {OFFSET_MAX // per_page + 1} com per_page={per_page}"
+        )
+
+    sort = args.get("sort") or "id"
+    if sort not in SORT_FIELDS:
+        raise ParametroInvalido(
+            f"Campo de ordenação inválido. Use: {', '.join(SORT_FIELDS)}"
+        )
+
+    order = args.get("order") or "asc"
+    if order not in ("asc", "desc"):
+        raise ParametroInvalido("Direção de ordenação inválida. Use: asc ou desc")
+
+    cidade = args.get("cidade") or None
+    bairro = args.get("bairro") or None
+    if bairro and not cidade:
+        raise ParametroInvalido("bairro só pode ser filtrado junto com cidade")
+
+    return ListagemSpec(
+        tipo=args.get("tipo") or None,
+        cidade=cidade,
+        data_inicio=_data(args, "data_inicio"),
+        data_fim=_data(args, "data_fim"),
+        bairro=bairro,
+        cep=_prefixo_cep(args),
+        sort=sort,
+        order=order,
+        page=page,
+        per_page=per_page,
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _query_base(spec):
+    """
+    Query string canônica do spec, sem a página e terminada em "&" (ou
+    vazia), pronta para receber "page=N". Só inclui o que difere do padrão.
+    """
+    padrao = ListagemSpec()
+    params = [
+        (campo, valor)
+        for campo, valor in zip(spec._fields, spec)
+        if campo != "page" and valor != getattr(padrao, campo)
+    ]
+    query = urllib.parse.urlencode(params)
+    return query + "&" if query else ""
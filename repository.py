@@ -0,0 +1,1229 @@
+import datetime
+import decimal
+import functools
+import itertools
+import os
+import re
+import sqlite3
+import unicodedata
+
+from mysql.connector import Error, errorcode
+
+from db import LazyDatabase, get_db_connection
+
+COLUMNS = (
+    "logradouro",
+    "tipo_logradouro",
+    "bairro",
+    "cidade",
+    "cep",
+    "tipo",
+    "valor",
+    "data_aquisicao",
+)
+SORT_FIELDS = ("id", "valor", "data_aquisicao", "cidade", "tipo")
+
+# Colunas na ordem das tabelas imoveis e imoveis_arquivo
+ALL_COLUMNS = ", ".join(("id",) + COLUMNS)
+
+# Tamanho da coluna cep; limita a faixa da busca por prefixo
+CEP_MAX = 20
+
+
+def normalizar_cep(cep):
+    """Só os dígitos do CEP ("12345-678" -> "12345678"); vazio vira None."""
+    if cep is None:
+        return None
+    return re.sub(r"\D", "", str(cep)) or None
+
+
+@functools.lru_cache(maxsize=65536)
+def sem_acento(texto):
+    """
+    Chave de comparação de cidade, bairro e tipo: sem maiúsculas e sem
+    acentos ("São Paulo" -> "sao paulo"), como a collation padrão do MySQL
+    (utf8mb4_0900_ai_ci).
+    """
+    decomposto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+class ImovelRepository:
+    """
+    Acesso aos imóveis, independente do banco. As subclasses definem como
+    conectar, o estilo de placeholder e o schema; as consultas e a semântica
+    de filtro/ordenação/paginação são as mesmas para todos os backends.
+
+    Imóveis arquivados (tabela imoveis_arquivo) saem da listagem, mas
+    continuam acessíveis por ID em get/update/delete.
+
+    A tabela localidades guarda quantos imóveis (da tabela quente) há por
+    cidade e bairro ('' quando o bairro é nulo). Gatilhos no banco a mantêm
+    a cada escrita, inclusive de outros processos e cargas em lote. Outros
+    gatilhos registram em valor_eventos cada valor que entra (+1) ou sai
+    (-1) de imoveis ou imoveis_arquivo, para a distribuição de valores.
+    """
+
+    placeholder = "%s"
+    # CEPs ainda não normalizados (com algo além de dígitos, ou vazios)
+    filtro_cep_sujo = "cep REGEXP '[^0-9]' OR cep = ''"
+    # Agrupamento de bairro com a mesma comparação da chave de localidades
+    grupo_bairro = "COALESCE(bairro, '')"
+    # Eventos de valor mais antigos que {p} segundos
+    eventos_expirados = "criado_em < NOW() - INTERVAL {p} SECOND"
+    schema = ()
+
+    def __init__(self, db):
+        self.db = db
+        self._compilar_planos()
+
+    # Infraestrutura
+
+    def ping(self):
+        return self.db.ping()
+
+    def reset(self):
+        self.db.reset()
+
+    def close_all(self):
+        self.db.close_all()
+
+    def criar_schema(self):
+        cursor = self.db.connection().cursor()
+        for statement in self.schema:
+            cursor.execute(statement)
+        cursor.close()
+
+    def executar_script(self, script):
+        raise NotImplementedError
+
+    def migrar_collation(self):
+        """Tabelas recriadas para a collation atual (só o SQLite precisa)."""
+        return []
+
+    def truncate(self):
+        cursor = self.db.connection().cursor()
+        cursor.execute("DELETE FROM imoveis")
+        cursor.close()
+
+    def _cursor(self):
+        raise NotImplementedError
+
+    def _sql(self, sql):
+        return sql.replace("{p}", self.placeholder)
+
+    def _row(self, row):
+        """Converte tipos do driver para os que a API serializa em JSON."""
+        if row is None:
+            return None
+        row = dict(row)
+        if isinstance(row.get("valor"), decimal.Decimal):
+            row["valor"] = float(row["valor"])
+        if isinstance(row.get("data_aquisicao"), datetime.date):
+            row["data_aquisicao"] = row["data_aquisicao"].isoformat()
+        return row
+
+    def _compilar_planos(self):
+        """
+        Monta uma vez o SQL de cada formato de consulta: quais filtros estão
+        presentes (tipo, cidade, data_inicio, data_fim, bairro, cep) e, na
+        listagem, a ordenação. Por requisição resta só escolher o plano e os
+        parâmetros.
+        """
+        # Igualdade direta, para usar os índices: a comparação sem diferenciar
+        # maiúsculas e acentos vem da collation (padrão do MySQL, sem_acento
+        # no SQLite)
+        condicoes = (
+            "tipo = {p}",
+            "cidade = {p}",
+            # Intervalo direto na coluna de particionamento: o MySQL só lê
+            # as partições que cobrem as datas pedidas
+            "data_aquisicao >= {p}",
+            "data_aquisicao <= {p}",
+            "bairro = {p}",
+            # Prefixo como faixa (ver _formato): usa o índice em cep em
+            # qualquer collation, ao contrário de LIKE no SQLite
+            "cep BETWEEN {p} AND {p}",
+        )
+        self._sql_count = {}
+        self._sql_list = {}
+        for formato in itertools.product((False, True), repeat=len(condicoes)):
+            where_conditions = [c for c, usado in zip(condicoes, formato) if usado]
+            where_clause = (
+                " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+            )
+            self._sql_count[formato] = self._sql(
+                f"SELECT COUNT(*) AS total FROM imoveis{where_clause}"
+            )
+            for sort, order in itertools.product(SORT_FIELDS, ("asc", "desc")):
+                self._sql_list[formato, sort, order] = self._sql(
+                    f"SELECT * FROM imoveis{where_clause}"
+                    f" ORDER BY {sort} {order.upper()} LIMIT {{p}} OFFSET {{p}}"
+                )
+
+    @staticmethod
+    def _formato(filtros):
+        *filtros, cep = filtros
+        params = [valor for valor in filtros if valor]
+        if cep:
+            # CEPs só têm dígitos: os que começam com o prefixo são
+            # exatamente os que ficam entre ele e ele completado com 9
+            params += [cep, cep.ljust(CEP_MAX, "9")]
+        return tuple(bool(valor) for valor in filtros + [cep]), params
+
+    # Consultas
+
+    def count(self, tipo=None, cidade=None, data_inicio=None, data_fim=None,
+              bairro=None, cep=None):
+        formato, params = self._formato(
+            (tipo, cidade, data_inicio, data_fim, bairro, cep)
+        )
+        cursor = self._cursor()
+        cursor.execute(self._sql_count[formato], params)
+        total = cursor.fetchone()["total"]
+        cursor.close()
+        return total
+
+    def list(self, tipo, cidade, sort, order, page, per_page,
+             data_inicio=None, data_fim=None, bairro=None, cep=None):
+        formato, params = self._formato(
+            (tipo, cidade, data_inicio, data_fim, bairro, cep)
+        )
+        sql = self._sql_list.get((formato, sort, order))
+        if sql is None:
+            raise ValueError(f"Ordenação inválida: {sort} {order}")
+        offset = (page - 1) * per_page
+        cursor = self._cursor()
+        cursor.execute(sql, params + [per_page, offset])
+        rows = [self._row(row) for row in cursor.fetchall()]
+        cursor.close()
+        return rows
+
+    def get(self, id):
+        # Uma ida ao banco: a tabela quente primeiro, depois o arquivo
+        query = f"""
+        SELECT {ALL_COLUMNS} FROM imoveis WHERE id = {{p}}
+        UNION ALL
+        SELECT {ALL_COLUMNS} FROM imoveis_arquivo WHERE id = {{p}}
+        LIMIT 1
+        """
+        cursor = self._cursor()
+        cursor.execute(self._sql(query), (id, id))
+        row = self._row(cursor.fetchone())
+        cursor.fetchall()
+        cursor.close()
+        return row
+
+    def count_valores(self):
+        """Total de linhas com valor (o que entra na distribuição)."""
+        cursor = self._cursor()
+        cursor.execute(
+            "SELECT (SELECT COUNT(valor) FROM imoveis)"
+            " + (SELECT COUNT(valor) FROM imoveis_arquivo) AS total"
+        )
+        total = cursor.fetchone()["total"]
+        cursor.close()
+        return total
+
+    def valores(self, janela=1000, batch=10_000):
+        """
+        Leitura consistente para reconstruir a distribuição. Abre uma
+        transação e retorna (seqs, linhas): os seqs dos últimos `janela`
+        eventos de valor_eventos já refletidos nos dados e um iterador de
+        (cidade, tipo, valor) de todas as linhas, lido na mesma transação,
+        que a encerra ao se esgotar.
+        """
+        conn = self.db.connection()
+        cursor = conn.cursor()
+        self._begin(conn)
+        cursor.execute(
+            self._sql(
+                "SELECT seq FROM valor_eventos WHERE seq >"
+                " (SELECT COALESCE(MAX(seq), 0) FROM valor_eventos) - {p}"
+            ),
+            (janela,),
+        )
+        seqs = [row[0] for row in cursor.fetchall()]
+        return seqs, self._linhas_valores(conn, cursor, batch)
+
+    def _linhas_valores(self, conn, cursor, batch):
+        try:
+            cursor.execute(
+                "SELECT cidade, tipo, valor FROM imoveis WHERE valor IS NOT NULL"
+                " UNION ALL"
+                " SELECT cidade, tipo, valor FROM imoveis_arquivo WHERE valor IS NOT NULL"
+            )
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                yield from (tuple(row) for row in rows)
+        finally:
+            conn.commit()
+            cursor.close()
+
+    def eventos_valor(self, desde, faltantes=()):
+        """
+        Eventos (seq, cidade, tipo, valor, delta) com seq > desde, mais os de
+        seq em `faltantes` (abaixo de desde, ainda não vistos), em ordem.
+        """
+        cursor = self.db.connection().cursor()
+        condicao = "seq > {p}"
+        if faltantes:
+            condicao += f" OR seq IN ({', '.join(['{p}'] * len(faltantes))})"
+        cursor.execute(
+            self._sql(
+                "SELECT seq, cidade, tipo, valor, delta FROM valor_eventos"
+                f" WHERE {condicao} ORDER BY seq"
+            ),
+            (desde, *faltantes),
+        )
+        eventos = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+        return eventos
+
+    def podar_eventos_valor(self, segundos):
+        """Remove eventos de valor mais antigos que `segundos`."""
+        cursor = self.db.connection().cursor()
+        cursor.execute(
+            self._sql(f"DELETE FROM valor_eventos WHERE {self.eventos_expirados}"),
+            (int(segundos),),
+        )
+        removidos = cursor.rowcount
+        cursor.close()
+        return removidos
+
+    def add(self, data):
+        sql = f"""
+        INSERT INTO imoveis ({", ".join(COLUMNS)})
+        VALUES ({", ".join(["{p}"] * len(COLUMNS))})
+        """
+        cursor = self._cursor()
+        cursor.execute(self._sql(sql), [data.get(col) for col in COLUMNS])
+        new_id = cursor.lastrowid
+        cursor.close()
+        return new_id
+
+    def add_many(self, rows):
+        """Inserção em lote de tuplas na ordem de COLUMNS, numa transação."""
+        sql = f"""
+        INSERT INTO imoveis ({", ".join(COLUMNS)})
+        VALUES ({", ".join(["{p}"] * len(COLUMNS))})
+        """
+        conn = self.db.connection()
+        cursor = conn.cursor()
+        self._begin(conn)
+        cursor.executemany(self._sql(sql), rows)
+        conn.commit()
+        cursor.close()
+
+    def update(self, id, data):
+        cursor = self._cursor()
+        for tabela in ("imoveis", "imoveis_arquivo"):
+            sql = f"""
+            UPDATE {tabela}
+            SET {", ".join(f"{col} = {{p}}" for col in COLUMNS)}
+            WHERE id = {{p}}
+            """
+            cursor.execute(self._sql(sql), [data.get(col) for col in COLUMNS] + [id])
+            if cursor.rowcount > 0:
+                cursor.close()
+                return True
+        cursor.close()
+        return False
+
+    def delete(self, id):
+        cursor = self._cursor()
+        for tabela in ("imoveis", "imoveis_arquivo"):
+            cursor.execute(self._sql(f"DELETE FROM {tabela} WHERE id = {{p}}"), (id,))
+            if cursor.rowcount > 0:
+                cursor.close()
+                return True
+        cursor.close()
+        return False
+
+    def _begin(self, conn):
+        raise NotImplementedError
+
+    # Localidades e CEP
+
+    def localidades(self, cidade=None):
+        """Linhas (cidade, bairro, total) de localidades, ordenadas."""
+        where_clause = " WHERE cidade = {p}" if cidade else ""
+        cursor = self._cursor()
+        cursor.execute(
+            self._sql(
+                f"SELECT cidade, bairro, total FROM localidades{where_clause}"
+                " ORDER BY cidade, bairro"
+            ),
+            (cidade,) if cidade else (),
+        )
+        rows = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        return rows
+
+    def recalcular_localidades(self):
+        """Reconstrói localidades a partir de imoveis (após cargas sem gatilho)."""
+        conn = self.db.connection()
+        cursor = conn.cursor()
+        self._begin(conn)
+        try:
+            cursor.execute("DELETE FROM localidades")
+            cursor.execute(
+                "INSERT INTO localidades (cidade, bairro, total)"
+                f" SELECT cidade, {self.grupo_bairro}, COUNT(*) FROM imoveis"
+                f" GROUP BY cidade, {self.grupo_bairro}"
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def normalizar_ceps(self, batch=5_000):
+        """
+        Deixa só dígitos nos CEPs gravados antes da normalização, em
+        imoveis e imoveis_arquivo. Retorna quantas linhas mudaram.
+        """
+        atualizados = 0
+        for tabela in ("imoveis", "imoveis_arquivo"):
+            cursor = self._cursor()
+            cursor.execute(f"SELECT id, cep FROM {tabela} WHERE {self.filtro_cep_sujo}")
+            alteracoes = [
+                (normalizar_cep(row["cep"]), row["id"]) for row in cursor.fetchall()
+            ]
+            cursor.close()
+
+            conn = self.db.connection()
+            cursor = conn.cursor()
+            sql = self._sql(f"UPDATE {tabela} SET cep = {{p}} WHERE id = {{p}}")
+            for inicio in range(0, len(alteracoes), batch):
+                self._begin(conn)
+                cursor.executemany(sql, alteracoes[inicio:inicio + batch])
+                conn.commit()
+            cursor.close()
+            atualizados += len(alteracoes)
+        return atualizados
+
+    # Particionamento e arquivamento
+
+    def particoes(self):
+        """Partições de imoveis como (nome, limite superior ou None, linhas)."""
+        return []
+
+    def preparar_particoes(self, granularidade="year", inicio=2010, adiante=1):
+        """Cria/estende as partições por data_aquisicao, se o backend tiver."""
+        limites_particoes(granularidade, inicio, adiante)
+        return []
+
+    def arquivar(self, antes_de):
+        """
+        Move para imoveis_arquivo, numa transação, os imóveis adquiridos
+        antes de `antes_de`. Retorna quantos foram movidos.
+        """
+        conn = self.db.connection()
+        cursor = conn.cursor()
+        self._begin(conn)
+        try:
+            cursor.execute(
+                self._sql(
+                    f"INSERT INTO imoveis_arquivo ({ALL_COLUMNS})"
+                    f" SELECT {ALL_COLUMNS} FROM imoveis WHERE data_aquisicao < {{p}}"
+                ),
+                (antes_de.isoformat(),),
+            )
+            movidos = cursor.rowcount
+            # O DELETE abaixo registra -1 para cada valor, mas ele continua
+            # no arquivo (que também entra na distribuição): compensa
+            cursor.execute(
+                self._sql(
+                    "INSERT INTO valor_eventos (cidade, tipo, valor, delta)"
+                    " SELECT cidade, tipo, valor, 1 FROM imoveis"
+                    " WHERE data_aquisicao < {p} AND valor IS NOT NULL"
+                ),
+                (antes_de.isoformat(),),
+            )
+            cursor.execute(
+                self._sql("DELETE FROM imoveis WHERE data_aquisicao < {p}"),
+                (antes_de.isoformat(),),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        return movidos
+
+    def _tabela_existe(self, nome):
+        raise NotImplementedError
+
+    def _concluir_troca(self):
+        """
+        Move para imoveis_arquivo as linhas que estiverem em imoveis_troca
+        (a partição trocada por último, ou a de uma execução interrompida)
+        e só então remove a tabela. Inserção e remoção são uma transação;
+        um ID já arquivado faz a inserção falhar e as linhas ficam em
+        imoveis_troca, nunca se perdem. Retorna quantas foram movidas.
+        """
+        if not self._tabela_existe("imoveis_troca"):
+            return 0
+        conn = self.db.connection()
+        cursor = conn.cursor()
+        self._begin(conn)
+        try:
+            cursor.execute(
+                f"INSERT INTO imoveis_arquivo ({ALL_COLUMNS})"
+                f" SELECT {ALL_COLUMNS} FROM imoveis_troca"
+            )
+            movidos = cursor.rowcount
+            cursor.execute("DELETE FROM imoveis_troca")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            cursor.close()
+            raise
+        cursor.execute("SELECT COUNT(*) FROM imoveis_troca")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("DROP TABLE imoveis_troca")
+        cursor.close()
+        return movidos
+
+    def contagens(self):
+        """Linhas na tabela quente e no arquivo."""
+        cursor = self._cursor()
+        cursor.execute(
+            "SELECT (SELECT COUNT(*) FROM imoveis) AS imoveis,"
+            " (SELECT COUNT(*) FROM imoveis_arquivo) AS imoveis_arquivo"
+        )
+        row = dict(cursor.fetchone())
+        cursor.close()
+        return row
+
+
+# Menor DATE válida no MySQL: abaixo dela só ficam NULL (e datas zeradas)
+DATA_MINIMA = "1000-01-01"
+PARTICAO_SEM_DATA = "p_sem_data"
+
+
+def particoes_arquivaveis(particoes, antes_de):
+    """
+    Nomes das partições inteiramente anteriores a `antes_de`. A partição
+    das datas nulas nunca é arquivada.
+    """
+    return [
+        nome
+        for nome, limite, _ in particoes
+        if nome != PARTICAO_SEM_DATA and limite is not None and limite <= antes_de
+    ]
+
+
+def limites_particoes(granularidade, inicio, adiante, hoje=None):
+    """
+    Partições do ano `inicio` até `adiante` períodos depois do atual, como
+    (nome, limite superior exclusivo). Ex.: ("p2020", date(2021, 1, 1)).
+    """
+    if granularidade not in ("year", "month"):
+        raise ValueError("Granularidade deve ser year ou month")
+    hoje = hoje or datetime.date.today()
+    if granularidade == "year":
+        fim = (hoje.year + adiante + 1, 1)
+    else:
+        proximo = hoje.year * 12 + hoje.month - 1 + adiante + 1
+        fim = (proximo // 12, proximo % 12 + 1)
+    ano, mes = inicio, 1
+    limites = []
+    while (ano, mes) < fim:
+        if granularidade == "year":
+            nome = f"p{ano}"
+            ano += 1
+        else:
+            nome = f"p{ano}{mes:02d}"
+            ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        limites.append((nome, datetime.date(ano, mes, 1)))
+    return limites
+
+
+class MySQLRepository(ImovelRepository):
+    """
+    Backend MySQL. Depois de preparar_particoes(), imoveis é particionada
+    por RANGE COLUMNS(data_aquisicao): p_sem_data guarda as datas nulas (e
+    nunca é arquivada), p_antigo as anteriores ao início, pAAAA (ou
+    pAAAAMM) um período cada e p_max o que vier depois. O MySQL exige que toda chave única contenha a coluna de
+    particionamento; como data_aquisicao pode ser nula, a chave primária
+    vira um índice comum em id (o AUTO_INCREMENT continua gerando IDs únicos).
+    """
+
+    placeholder = "%s"
+    # Criados à parte do CREATE TABLE para chegarem também a bancos existentes
+    indices = {
+        "idx_imoveis_cep": "CREATE INDEX idx_imoveis_cep ON imoveis (cep)",
+        "idx_imoveis_cidade_bairro":
+            "CREATE INDEX idx_imoveis_cidade_bairro ON imoveis (cidade, bairro)",
+    }
+    gatilhos = {
+        "trg_localidades_insert": """
+        CREATE TRIGGER trg_localidades_insert AFTER INSERT ON imoveis
+        FOR EACH ROW
+        INSERT INTO localidades (cidade, bairro, total)
+        VALUES (NEW.cidade, COALESCE(NEW.bairro, ''), 1)
+        ON DUPLICATE KEY UPDATE total = total + 1
+        """,
+        "trg_localidades_delete": """
+        CREATE TRIGGER trg_localidades_delete AFTER DELETE ON imoveis
+        FOR EACH ROW
+        BEGIN
+            UPDATE localidades SET total = total - 1
+            WHERE cidade = OLD.cidade AND bairro = COALESCE(OLD.bairro, '');
+            DELETE FROM localidades
+            WHERE cidade = OLD.cidade AND bairro = COALESCE(OLD.bairro, '')
+              AND total <= 0;
+        END
+        """,
+        "trg_localidades_update": """
+        CREATE TRIGGER trg_localidades_update AFTER UPDATE ON imoveis
+        FOR EACH ROW
+        BEGIN
+            IF NOT (OLD.cidade <=> NEW.cidade AND OLD.bairro <=> NEW.bairro) THEN
+                UPDATE localidades SET total = total - 1
+                WHERE cidade = OLD.cidade AND bairro = COALESCE(OLD.bairro, '');
+                DELETE FROM localidades
+                WHERE cidade = OLD.cidade AND bairro = COALESCE(OLD.bairro, '')
+                  AND total <= 0;
+                INSERT INTO localidades (cidade, bairro, total)
+                VALUES (NEW.cidade, COALESCE(NEW.bairro, ''), 1)
+                ON DUPLICATE KEY UPDATE total = total + 1;
+            END IF;
+        END
+        """,
+        "trg_valor_insert": """
+        CREATE TRIGGER trg_valor_insert AFTER INSERT ON imoveis
+        FOR EACH ROW
+        INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+        VALUES (NEW.cidade, NEW.tipo, NEW.valor, 1)
+        """,
+        "trg_valor_delete": """
+        CREATE TRIGGER trg_valor_delete AFTER DELETE ON imoveis
+        FOR EACH ROW
+        INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+        VALUES (OLD.cidade, OLD.tipo, OLD.valor, -1)
+        """,
+        "trg_valor_update": """
+        CREATE TRIGGER trg_valor_update AFTER UPDATE ON imoveis
+        FOR EACH ROW
+        BEGIN
+            IF NOT (OLD.cidade <=> NEW.cidade AND OLD.tipo <=> NEW.tipo
+                    AND OLD.valor <=> NEW.valor) THEN
+                INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+                VALUES (OLD.cidade, OLD.tipo, OLD.valor, -1),
+                       (NEW.cidade, NEW.tipo, NEW.valor, 1);
+            END IF;
+        END
+        """,
+        # Inserções no arquivo vêm de imoveis (arquivamento): sem evento
+        "trg_valor_arquivo_delete": """
+        CREATE TRIGGER trg_valor_arquivo_delete AFTER DELETE ON imoveis_arquivo
+        FOR EACH ROW
+        INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+        VALUES (OLD.cidade, OLD.tipo, OLD.valor, -1)
+        """,
+        "trg_valor_arquivo_update": """
+        CREATE TRIGGER trg_valor_arquivo_update AFTER UPDATE ON imoveis_arquivo
+        FOR EACH ROW
+        BEGIN
+            IF NOT (OLD.cidade <=> NEW.cidade AND OLD.tipo <=> NEW.tipo
+                    AND OLD.valor <=> NEW.valor) THEN
+                INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+                VALUES (OLD.cidade, OLD.tipo, OLD.valor, -1),
+                       (NEW.cidade, NEW.tipo, NEW.valor, 1);
+            END IF;
+        END
+        """,
+    }
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS imoveis (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            logradouro VARCHAR(255) NOT NULL,
+            tipo_logradouro VARCHAR(255),
+            bairro VARCHAR(255),
+            cidade VARCHAR(255) NOT NULL,
+            cep VARCHAR(20),
+            tipo VARCHAR(50),
+            valor DECIMAL(10, 2),
+            data_aquisicao DATE,
+            INDEX idx_imoveis_tipo (tipo),
+            INDEX idx_imoveis_cidade (cidade),
+            INDEX idx_imoveis_valor (valor),
+            INDEX idx_imoveis_data_aquisicao (data_aquisicao)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS imoveis_arquivo (
+            id INT PRIMARY KEY,
+            logradouro VARCHAR(255) NOT NULL,
+            tipo_logradouro VARCHAR(255),
+            bairro VARCHAR(255),
+            cidade VARCHAR(255) NOT NULL,
+            cep VARCHAR(20),
+            tipo VARCHAR(50),
+            valor DECIMAL(10, 2),
+            data_aquisicao DATE,
+            INDEX idx_imoveis_arquivo_data_aquisicao (data_aquisicao)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS localidades (
+            cidade VARCHAR(255) NOT NULL,
+            bairro VARCHAR(255) NOT NULL DEFAULT '',
+            total INT NOT NULL,
+            PRIMARY KEY (cidade, bairro)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS valor_eventos (
+            seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+            cidade VARCHAR(255),
+            tipo VARCHAR(50),
+            valor DECIMAL(10, 2),
+            delta TINYINT NOT NULL,
+            criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_valor_eventos_criado_em (criado_em)
+        );
+        """,
+    )
+
+    def __init__(self, retries=3, backoff=0.5):
+        self._schema_pronto = False
+        super().__init__(LazyDatabase(self._connect, retries=retries, backoff=backoff))
+
+    def _connect(self):
+        conn = get_db_connection()
+        if conn is not None and not self._schema_pronto:
+            # Bancos anteriores a imoveis_arquivo, localidades e valor_eventos
+            # ganham as tabelas e os gatilhos na primeira conexão do processo,
+            # como no SQLite. Índices faltantes ficam para criar_schema()
+            # (createdb.py/maintenance.py): em tabelas grandes são demorados
+            try:
+                cursor = conn.cursor()
+                self._criar_tabelas_e_gatilhos(cursor)
+                cursor.close()
+                self._schema_pronto = True
+            except Error as e:
+                print(f"Error creating MySQL schema: {e}")
+        return conn
+
+    def _cursor(self):
+        return self.db.connection().cursor(dictionary=True)
+
+    def _begin(self, conn):
+        conn.start_transaction()
+
+    def criar_schema(self):
+        cursor = self.db.connection().cursor()
+        self._criar_tabelas_e_gatilhos(cursor)
+        cursor.execute(
+            "SELECT INDEX_NAME FROM information_schema.STATISTICS"
+            " WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'imoveis'"
+        )
+        existentes = {row[0] for row in cursor.fetchall()}
+        for nome, statement in self.indices.items():
+            if nome not in existentes:
+                cursor.execute(statement)
+        cursor.close()
+
+    def _criar_tabelas_e_gatilhos(self, cursor):
+        for statement in self.schema:
+            cursor.execute(statement)
+        cursor.execute(
+            "SELECT TRIGGER_NAME FROM information_schema.TRIGGERS"
+            " WHERE TRIGGER_SCHEMA = DATABASE()"
+        )
+        existentes = {row[0] for row in cursor.fetchall()}
+        for nome, statement in self.gatilhos.items():
+            if nome in existentes:
+                continue
+            try:
+                cursor.execute(statement)
+            except Error as e:
+                # Outro worker criou o mesmo gatilho entre a consulta e aqui
+                if e.errno != errorcode.ER_TRG_ALREADY_EXISTS:
+                    raise
+
+    def truncate(self):
+        # TRUNCATE não dispara gatilhos
+        cursor = self.db.connection().cursor()
+        cursor.execute("TRUNCATE TABLE imoveis")
+        cursor.execute("TRUNCATE TABLE localidades")
+        cursor.close()
+
+    def executar_script(self, script):
+        cursor = self.db.connection().cursor()
+        cursor.execute(script)
+        cursor.close()
+
+    def particoes(self):
+        cursor = self._cursor()
+        cursor.execute(
+            """
+            SELECT PARTITION_NAME AS nome, PARTITION_DESCRIPTION AS limite,
+                   TABLE_ROWS AS linhas
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'imoveis'
+              AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """
+        )
+        particoes = []
+        for row in cursor.fetchall():
+            limite = row["limite"]
+            if limite == "MAXVALUE":
+                limite = None
+            else:
+                limite = datetime.date.fromisoformat(limite.strip("'"))
+            particoes.append((row["nome"], limite, row["linhas"]))
+        cursor.close()
+        return particoes
+
+    def preparar_particoes(self, granularidade="year", inicio=2010, adiante=1):
+        """
+        Idempotente: na primeira vez particiona a tabela; nas seguintes só
+        cria as partições dos períodos novos, dividindo p_max. Retorna os
+        nomes das partições criadas.
+        """
+        limites = limites_particoes(granularidade, inicio, adiante)
+        existentes = self.particoes()
+        cursor = self.db.connection().cursor()
+
+        if not existentes:
+            cursor.execute(
+                """
+                SELECT COUNT(*) FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'imoveis'
+                  AND INDEX_NAME = 'PRIMARY'
+                """
+            )
+            if cursor.fetchone()[0]:
+                cursor.execute(
+                    "ALTER TABLE imoveis DROP PRIMARY KEY, ADD INDEX idx_imoveis_id (id)"
+                )
+            definicoes = [
+                f"PARTITION {PARTICAO_SEM_DATA} VALUES LESS THAN ('{DATA_MINIMA}')",
+                f"PARTITION p_antigo VALUES LESS THAN ('{inicio}-01-01')",
+            ]
+            definicoes += [
+                f"PARTITION {nome} VALUES LESS THAN ('{limite.isoformat()}')"
+                for nome, limite in limites
+            ]
+            definicoes.append("PARTITION p_max VALUES LESS THAN (MAXVALUE)")
+            cursor.execute(
+                "ALTER TABLE imoveis PARTITION BY RANGE COLUMNS(data_aquisicao) ("
+                + ", ".join(definicoes)
+                + ")"
+            )
+            cursor.close()
+            return (
+                [PARTICAO_SEM_DATA, "p_antigo"]
+                + [nome for nome, _ in limites]
+                + ["p_max"]
+            )
+
+        criadas = self._separar_sem_data(existentes)
+        maior = max(limite for _, limite, _ in existentes if limite is not None)
+        novos = [(nome, limite) for nome, limite in limites if limite > maior]
+        if novos:
+            definicoes = [
+                f"PARTITION {nome} VALUES LESS THAN ('{limite.isoformat()}')"
+                for nome, limite in novos
+            ]
+            definicoes.append("PARTITION p_max VALUES LESS THAN (MAXVALUE)")
+            cursor.execute(
+                "ALTER TABLE imoveis REORGANIZE PARTITION p_max INTO ("
+                + ", ".join(definicoes)
+                + ")"
+            )
+        cursor.close()
+        return criadas + [nome for nome, _ in novos]
+
+    def _separar_sem_data(self, particoes):
+        """
+        Tabelas particionadas antes de p_sem_data existir guardam as datas
+        nulas na primeira partição, que é arquivável: separa-as numa
+        partição própria. Retorna as partições criadas.
+        """
+        primeira, limite, _ = particoes[0]
+        if primeira == PARTICAO_SEM_DATA:
+            return []
+        cursor = self.db.connection().cursor()
+        cursor.execute(
+            f"ALTER TABLE imoveis REORGANIZE PARTITION {primeira} INTO ("
+            f"PARTITION {PARTICAO_SEM_DATA} VALUES LESS THAN ('{DATA_MINIMA}'), "
+            f"PARTITION {primeira} VALUES LESS THAN ('{limite.isoformat()}'))"
+        )
+        cursor.close()
+        return [PARTICAO_SEM_DATA]
+
+    def _tabela_existe(self, nome):
+        cursor = self.db.connection().cursor()
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.TABLES"
+            " WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (nome,),
+        )
+        existe = cursor.fetchone()[0] > 0
+        cursor.close()
+        return existe
+
+    def arquivar(self, antes_de):
+        """
+        Com a tabela particionada, arquiva partições inteiras cujo limite
+        superior seja <= antes_de: cada uma é trocada (EXCHANGE PARTITION,
+        sem copiar linhas) por imoveis_troca, vazia, e o conteúdo trocado
+        vai para imoveis_arquivo. Se uma execução anterior parou no meio,
+        termina primeiro de mover o que ficou em imoveis_troca.
+        """
+        particoes = self.particoes()
+        if not particoes:
+            return super().arquivar(antes_de)
+        if self._separar_sem_data(particoes):
+            particoes = self.particoes()
+
+        movidos = self._concluir_troca()
+        cursor = self.db.connection().cursor()
+        for nome in particoes_arquivaveis(particoes, antes_de):
+            cursor.execute("CREATE TABLE imoveis_troca LIKE imoveis")
+            cursor.execute("ALTER TABLE imoveis_troca REMOVE PARTITIONING")
+            cursor.execute(
+                f"ALTER TABLE imoveis EXCHANGE PARTITION {nome} WITH TABLE imoveis_troca"
+            )
+            movidos += self._concluir_troca()
+        cursor.close()
+        # EXCHANGE PARTITION não dispara gatilhos
+        self.recalcular_localidades()
+        return movidos
+
+
+def _comparar_sem_acento(a, b):
+    a, b = sem_acento(a), sem_acento(b)
+    return (a > b) - (a < b)
+
+
+def _sem_espacos(sql):
+    return " ".join(sql.split()) if sql else None
+
+
+# Maior inteiro que o SQLite aceita como parâmetro
+SQLITE_MAX_INT = 2**63 - 1
+
+
+class SQLiteRepository(ImovelRepository):
+    """
+    Backend embutido: um arquivo local (ou réplica) em modo WAL, com uma
+    conexão por thread. cidade, bairro e tipo usam a collation sem_acento,
+    registrada em cada conexão, para comparar e ordenar sem diferenciar
+    maiúsculas nem acentos, como a collation padrão do MySQL (NOCASE só
+    ignora maiúsculas ASCII: 'sao paulo' seria diferente de 'São Paulo').
+    Não há partições: intervalos de data usam o índice em data_aquisicao e
+    o arquivamento move as linhas pela data.
+    """
+
+    placeholder = "?"
+    filtro_cep_sujo = "cep GLOB '*[^0-9]*' OR cep = ''"
+    grupo_bairro = "COALESCE(bairro, '') COLLATE sem_acento"
+    eventos_expirados = "criado_em < datetime('now', '-' || {p} || ' seconds')"
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS imoveis (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            logradouro TEXT NOT NULL,
+            tipo_logradouro TEXT,
+            bairro TEXT COLLATE sem_acento,
+            cidade TEXT NOT NULL COLLATE sem_acento,
+            cep TEXT,
+            tipo TEXT COLLATE sem_acento,
+            valor REAL,
+            data_aquisicao TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_imoveis_tipo ON imoveis (tipo)",
+        "CREATE INDEX IF NOT EXISTS idx_imoveis_cidade ON imoveis (cidade)",
+        "CREATE INDEX IF NOT EXISTS idx_imoveis_valor ON imoveis (valor)",
+        "CREATE INDEX IF NOT EXISTS idx_imoveis_data_aquisicao ON imoveis (data_aquisicao)",
+        """
+        CREATE TABLE IF NOT EXISTS imoveis_arquivo (
+            id INTEGER PRIMARY KEY,
+            logradouro TEXT NOT NULL,
+            tipo_logradouro TEXT,
+            bairro TEXT COLLATE sem_acento,
+            cidade TEXT NOT NULL COLLATE sem_acento,
+            cep TEXT,
+            tipo TEXT COLLATE sem_acento,
+            valor REAL,
+            data_aquisicao TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_imoveis_arquivo_data_aquisicao"
+        " ON imoveis_arquivo (data_aquisicao)",
+        "CREATE INDEX IF NOT EXISTS idx_imoveis_cep ON imoveis (cep)",
+        "CREATE INDEX IF NOT EXISTS idx_imoveis_cidade_bairro ON imoveis (cidade, bairro)",
+        """
+        CREATE TABLE IF NOT EXISTS localidades (
+            cidade TEXT NOT NULL COLLATE sem_acento,
+            bairro TEXT NOT NULL DEFAULT '' COLLATE sem_acento,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (cidade, bairro)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS valor_eventos (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            cidade TEXT,
+            tipo TEXT,
+            valor REAL,
+            delta INTEGER NOT NULL,
+            criado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_valor_eventos_criado_em ON valor_eventos (criado_em)",
+    )
+    # Comparados com sqlite_master a cada abertura: um gatilho ausente ou
+    # com outra definição (de versões anteriores) é recriado numa transação
+    gatilhos = {
+        "trg_localidades_insert": """
+        CREATE TRIGGER trg_localidades_insert AFTER INSERT ON imoveis
+        BEGIN
+            INSERT INTO localidades (cidade, bairro, total)
+            VALUES (NEW.cidade, COALESCE(NEW.bairro, ''), 1)
+            ON CONFLICT (cidade, bairro) DO UPDATE SET total = total + 1;
+        END
+        """,
+        "trg_localidades_delete": """
+        CREATE TRIGGER trg_localidades_delete AFTER DELETE ON imoveis
+        BEGIN
+            UPDATE localidades SET total = total - 1
+            WHERE cidade = OLD.cidade AND bairro = COALESCE(OLD.bairro, '');
+            DELETE FROM localidades
+            WHERE cidade = OLD.cidade AND bairro = COALESCE(OLD.bairro, '')
+              AND total <= 0;
+        END
+        """,
+        "trg_localidades_update": """
+        CREATE TRIGGER trg_localidades_update
+        AFTER UPDATE OF cidade, bairro ON imoveis
+        WHEN OLD.cidade IS NOT NEW.cidade OR OLD.bairro IS NOT NEW.bairro
+        BEGIN
+            UPDATE localidades SET total = total - 1
+            WHERE cidade = OLD.cidade AND bairro = COALESCE(OLD.bairro, '');
+            DELETE FROM localidades
+            WHERE cidade = OLD.cidade AND bairro = COALESCE(OLD.bairro, '')
+              AND total <= 0;
+            INSERT INTO localidades (cidade, bairro, total)
+            VALUES (NEW.cidade, COALESCE(NEW.bairro, ''), 1)
+            ON CONFLICT (cidade, bairro) DO UPDATE SET total = total + 1;
+        END
+        """,
+        "trg_valor_insert": """
+        CREATE TRIGGER trg_valor_insert AFTER INSERT ON imoveis
+        BEGIN
+            INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+            VALUES (NEW.cidade, NEW.tipo, NEW.valor, 1);
+        END
+        """,
+        "trg_valor_delete": """
+        CREATE TRIGGER trg_valor_delete AFTER DELETE ON imoveis
+        BEGIN
+            INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+            VALUES (OLD.cidade, OLD.tipo, OLD.valor, -1);
+        END
+        """,
+        # update() grava todas as colunas: o WHEN evita eventos quando
+        # cidade, tipo e valor não mudaram, como o <=> do MySQL
+        "trg_valor_update": """
+        CREATE TRIGGER trg_valor_update
+        AFTER UPDATE OF cidade, tipo, valor ON imoveis
+        WHEN OLD.cidade IS NOT NEW.cidade OR OLD.tipo IS NOT NEW.tipo
+            OR OLD.valor IS NOT NEW.valor
+        BEGIN
+            INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+            VALUES (OLD.cidade, OLD.tipo, OLD.valor, -1),
+                   (NEW.cidade, NEW.tipo, NEW.valor, 1);
+        END
+        """,
+        "trg_valor_arquivo_delete": """
+        CREATE TRIGGER trg_valor_arquivo_delete AFTER DELETE ON imoveis_arquivo
+        BEGIN
+            INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+            VALUES (OLD.cidade, OLD.tipo, OLD.valor, -1);
+        END
+        """,
+        "trg_valor_arquivo_update": """
+        CREATE TRIGGER trg_valor_arquivo_update
+        AFTER UPDATE OF cidade, tipo, valor ON imoveis_arquivo
+        WHEN OLD.cidade IS NOT NEW.cidade OR OLD.tipo IS NOT NEW.tipo
+            OR OLD.valor IS NOT NEW.valor
+        BEGIN
+            INSERT INTO valor_eventos (cidade, tipo, valor, delta)
+            VALUES (OLD.cidade, OLD.tipo, OLD.valor, -1),
+                   (NEW.cidade, NEW.tipo, NEW.valor, 1);
+        END
+        """,
+    }
+
+    def __init__(self, path, retries=3, backoff=0.5):
+        self.path = path
+        self._schema_pronto = False
+        super().__init__(LazyDatabase(self._connect, retries=retries, backoff=backoff))
+
+    def _connect(self):
+        try:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.create_collation("sem_acento", _comparar_sem_acento)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            if not self._schema_pronto:
+                for statement in self.schema:
+                    conn.execute(statement)
+                if self._tabelas_nocase(conn):
+                    print(
+                        f"Warning: {self.path} still uses COLLATE NOCASE;"
+                        " run 'python maintenance.py backfill' to migrate it"
+                    )
+                self._atualizar_gatilhos(conn)
+                self._schema_pronto = True
+            return conn
+        except sqlite3.Error as e:
+            print(f"Error opening SQLite database {self.path}: {e}")
+            return None
+
+    def _tabelas_nocase(self, conn):
+        """Tabelas criadas por versões que usavam COLLATE NOCASE."""
+        return [
+            nome
+            for nome, sql in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'table'"
+            )
+            if nome in ("imoveis", "imoveis_arquivo", "localidades")
+            and "NOCASE" in sql.upper()
+        ]
+
+    def migrar_collation(self):
+        """
+        Recria com a collation sem_acento as tabelas de bancos antigos (com
+        COLLATE NOCASE), copiando as linhas, numa única transação. Os
+        gatilhos são recriados na mesma transação, então nenhuma escrita de
+        outro processo escapa deles. Retorna as tabelas recriadas.
+        """
+        conn = self.db.connection()
+        antigas = self._tabelas_nocase(conn)
+        if not antigas:
+            return []
+        criacao = {
+            nome: statement
+            for statement in self.schema
+            for nome in antigas
+            if f"TABLE IF NOT EXISTS {nome} (" in statement
+        }
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for nome in self.gatilhos:
+                conn.execute(f"DROP TRIGGER IF EXISTS {nome}")
+            for nome in antigas:
+                seq = conn.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = ?", (nome,)
+                ).fetchone()
+                conn.execute(
+                    criacao[nome].replace(f"IF NOT EXISTS {nome} (", f"{nome}_nova (")
+                )
+                conn.execute(f"INSERT INTO {nome}_nova SELECT * FROM {nome}")
+                conn.execute(f"DROP TABLE {nome}")
+                conn.execute(f"ALTER TABLE {nome}_nova RENAME TO {nome}")
+                if seq is not None:
+                    # Mantém o AUTOINCREMENT: IDs já usados não voltam
+                    conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (nome,))
+                    conn.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                        (nome, seq[0]),
+                    )
+            # Índices (removidos com as tabelas) e gatilhos
+            for statement in self.schema:
+                conn.execute(statement)
+            for sql in self.gatilhos.values():
+                conn.execute(sql)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return antigas
+
+    def _atualizar_gatilhos(self, conn):
+        atuais = dict(
+            conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")
+        )
+        pendentes = [
+            (nome, sql)
+            for nome, sql in self.gatilhos.items()
+            if _sem_espacos(atuais.get(nome)) != _sem_espacos(sql)
+        ]
+        if not pendentes:
+            return
+        # DROP e CREATE juntos: nenhuma escrita de outro processo passa
+        # entre eles sem gatilho
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for nome, sql in pendentes:
+                conn.execute(f"DROP TRIGGER IF EXISTS {nome}")
+                conn.execute(sql)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _cursor(self):
+        return self.db.connection().cursor()
+
+    def _begin(self, conn):
+        conn.execute("BEGIN")
+
+    def executar_script(self, script):
+        # imoveis.sql termina com COMMIT, então abre a transação antes
+        self.db.connection().executescript("BEGIN;\n" + script)
+
+    def _tabela_existe(self, nome):
+        cursor = self._cursor()
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (nome,),
+        )
+        existe = cursor.fetchone()[0] > 0
+        cursor.close()
+        return existe
+
+    def get(self, id):
+        if id > SQLITE_MAX_INT:
+            return None
+        return super().get(id)
+
+    def update(self, id, data):
+        if id > SQLITE_MAX_INT:
+            return False
+        return super().update(id, data)
+
+    def delete(self, id):
+        if id > SQLITE_MAX_INT:
+            return False
+        return super().delete(id)
+
+
+def criar_repositorio(backend=None, retries=3, backoff=0.5):
+    """Instancia o backend escolhido por DATABASE_BACKEND (mysql ou sqlite)."""
+    backend = (backend or os.getenv("DATABASE_BACKEND", "mysql")).lower()
+    if backend == "mysql":
+        return MySQLRepository(retries=retries, backoff=backoff)
+    if backend == "sqlite":
+        path = os.getenv("SQLITE_PATH", "imoveis.db")
+        return SQLiteRepository(path, retries=retries, backoff=backoff)
+    raise ValueError(f"DATABASE_BACKEND inválido: {backend} (use mysql ou sqlite)")
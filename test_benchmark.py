@@ -0,0 +1,46 @@
+from benchmark import comparar, gerar_imoveis, percentil
+
+
+def _resultado(rps, p50, p95, p99):
+    return {
+        "routes": {
+            "get_imoveis": {
+                "throughput_rps": rps,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+            }
+        }
+    }
+
+
+class TestBenchmark:
+    def test_percentil_nearest_rank(self):
+        amostras = list(range(1, 101))
+        assert percentil(amostras, 50) == 50
+        assert percentil(amostras, 95) == 95
+        assert percentil(amostras, 99) == 99
+        assert percentil([7], 99) == 7
+        assert percentil([], 50) is None
+
+    def test_gerar_imoveis_formato(self):
+        rows = list(gerar_imoveis(500, seed=1))
+        assert len(rows) == 500
+        assert rows == list(gerar_imoveis(500, seed=1))
+        for row in rows:
+            assert len(row) == 8
+            assert len(row[4]) == 5 and row[4].isdigit()
+            assert row[6] >= 50_000
+
+    def test_comparar_sem_regressao(self):
+        baseline = _resultado(1000, 2.0, 5.0, 9.0)
+        atual = _resultado(950, 2.1, 5.2, 9.5)
+        assert comparar(baseline, atual, 0.10) == []
+
+    def test_comparar_detecta_regressao(self):
+        baseline = _resultado(1000, 2.0, 5.0, 9.0)
+        atual = _resultado(800, 2.0, 7.0, 9.0)
+        regressoes = comparar(baseline, atual, 0.10)
+        assert len(regressoes) == 2
+        assert any("throughput" in r for r in regressoes)
+        assert any("p95_ms" in r for r in regressoes)
@@ -0,0 +1,186 @@
+import datetime
+import random
+
+from distribution import Histogram, QuantileSketch, ValorDistribution
+from repository import SQLiteRepository
+
+
+def _imovel(cidade, tipo, valor, data="2024-01-01"):
+    return {
+        "logradouro": "Rua A", "tipo_logradouro": "Rua", "bairro": "Centro",
+        "cidade": cidade, "cep": "01000000", "tipo": tipo, "valor": valor,
+        "data_aquisicao": data,
+    }
+
+
+class TestDistribution:
+    def test_quantis_dentro_do_erro_relativo(self):
+        rng = random.Random(7)
+        valores = [rng.uniform(50_000, 1_000_000) for _ in range(5_000)]
+        sketch = QuantileSketch(alpha=0.01)
+        for v in valores:
+            sketch.add(v)
+        ordenados = sorted(valores)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exato = ordenados[int(q * (len(ordenados) - 1))]
+            assert abs(sketch.quantile(q) - exato) <= 0.01 * exato
+
+    def test_merge_e_remove(self):
+        a, b = QuantileSketch(), QuantileSketch()
+        for v in range(1, 101):
+            (a if v % 2 else b).add(v * 1000)
+        a.merge(b)
+        assert a.count == 100
+        a.remove(100_000)
+        assert a.count == 99
+        assert abs(a.quantile(1) - 99_000) <= 0.01 * 99_000
+
+    def test_histograma_rebin_exato(self):
+        hist = Histogram(width=10_000)
+        for v in (5_000, 15_000, 15_500, 95_000, 99_999):
+            hist.add(v)
+        faixas = hist.rebin(5)
+        assert sum(f["count"] for f in faixas) == 5
+        assert faixas[0]["from"] == 0
+        assert faixas[-1]["to"] >= 100_000
+        hist.remove(15_000)
+        assert sum(f["count"] for f in hist.rebin(5)) == 4
+
+    def test_histograma_rebin_com_valor_extremo(self):
+        hist = Histogram(width=10_000)
+        for v in (5_000, 1e13):
+            hist.add(v)
+        faixas = hist.rebin(10)
+        assert len(faixas) == 10
+        assert (faixas[0]["count"], faixas[-1]["count"]) == (1, 1)
+        assert faixas[-1]["to"] > 1e13
+
+    def test_grupos_sem_acento(self):
+        dist = ValorDistribution()
+        dist.rebuild([("São Paulo", "casa", 100_000), ("SAO PAULO", "Casa", 200_000)])
+        assert dist.summary("sao paulo", "CASA")["count"] == 2
+
+    def test_snapshot_ida_e_volta(self, tmp_path):
+        path = str(tmp_path / "dist.json")
+        dist = ValorDistribution(snapshot_path=path)
+        dist.rebuild([("A", "casa", 100_000), ("a", "Casa", 200_000), ("B", "terreno", 50_000)])
+        outra = ValorDistribution(snapshot_path=path)
+        assert outra.load()
+        assert outra.summary("A", "CASA")["count"] == 2
+        assert not ValorDistribution(snapshot_path=path, alpha=0.02).load()
+
+    def test_ignora_valores_nao_finitos(self):
+        dist = ValorDistribution()
+        dist.rebuild([("A", "casa", float("inf")), ("A", "casa", 100_000)])
+        assert dist.summary("A", "casa")["count"] == 1
+
+    def test_reconstrucao_em_segundo_plano(self, repo):
+        repo.add(_imovel("A", "casa", 100_000))
+        dist = ValorDistribution()
+        dist.ensure(repo)
+        assert dist.wait(5)
+        assert dist.summary("A", "casa")["count"] == 1
+
+    def test_snapshot_antigo_recebe_escritas_posteriores(self, repo, tmp_path):
+        path = str(tmp_path / "dist.json")
+        ids = [repo.add(_imovel("A", "casa", v)) for v in (100_000, 200_000)]
+        dist = ValorDistribution(snapshot_path=path)
+        dist._reconstruir(repo)
+
+        # Escritas de outro worker depois do snapshot
+        repo.add(_imovel("A", "casa", 300_000))
+        repo.update(ids[0], _imovel("A", "casa", 150_000))
+        repo.delete(ids[1])
+        repo.add(_imovel("B", "terreno", 50_000))
+
+        outra = ValorDistribution(snapshot_path=path, max_age=float("inf"))
+        assert outra.load()
+        assert outra.summary("A", "casa")["count"] == 2
+        assert outra.sincronizar(repo) == 5
+        assert outra.sincronizar(repo) == 0
+        resumo = outra.summary("A", "casa")
+        assert resumo["count"] == 2
+        assert abs(resumo["max"] - 300_000) <= 0.01 * 300_000
+        assert abs(resumo["min"] - 150_000) <= 0.01 * 150_000
+        assert outra.summary()["count"] == repo.count_valores() == 3
+
+    def test_sincronizar_sem_escritas_nao_le_eventos(self, repo):
+        for v in (100_000, 200_000):
+            repo.add(_imovel("A", "casa", v))
+        dist = ValorDistribution()
+        dist._reconstruir(repo)
+        lidos = []
+        eventos_valor = repo.eventos_valor
+
+        def espiar(*args):
+            eventos = eventos_valor(*args)
+            lidos.extend(eventos)
+            return eventos
+
+        repo.eventos_valor = espiar
+        assert dist.sincronizar(repo) == 0
+        assert lidos == []
+
+    def test_evento_confirmado_fora_de_ordem(self, repo):
+        repo.add(_imovel("A", "casa", 100_000))
+        dist = ValorDistribution()
+        dist._reconstruir(repo)
+        # seq 2 ainda não confirmado quando o 3 já foi aplicado
+        conn = repo.db.connection()
+        conn.execute(
+            "INSERT INTO valor_eventos (seq, cidade, tipo, valor, delta)"
+            " VALUES (3, 'A', 'casa', 300000, 1)"
+        )
+        assert dist.sincronizar(repo) == 1
+        assert dist._faltantes() == [2]
+        conn.execute(
+            "INSERT INTO valor_eventos (seq, cidade, tipo, valor, delta)"
+            " VALUES (2, 'A', 'casa', 200000, 1)"
+        )
+        assert dist.sincronizar(repo) == 1
+        assert dist._faltantes() == []
+        assert dist.summary("A", "casa")["count"] == 3
+
+    def test_put_sem_mudanca_nao_gera_eventos(self, repo):
+        id_ = repo.add(_imovel("A", "casa", 100_000))
+        for _ in range(5):
+            repo.update(id_, _imovel("A", "casa", 100_000))
+        assert len(repo.eventos_valor(0)) == 1
+        repo.update(id_, _imovel("A", "casa", 120_000))
+        assert [e[4] for e in repo.eventos_valor(1)] == [-1, 1]
+
+    def test_gatilho_antigo_e_recriado(self, tmp_path):
+        path = str(tmp_path / "antigo.db")
+        antigo = SQLiteRepository(path)
+        conn = antigo.db.connection()
+        conn.execute("DROP TRIGGER trg_valor_update")
+        conn.execute(
+            "CREATE TRIGGER trg_valor_update AFTER UPDATE OF valor ON imoveis"
+            " BEGIN INSERT INTO valor_eventos (valor, delta) VALUES (NEW.valor, 1); END"
+        )
+        antigo.close_all()
+        repo = SQLiteRepository(path)
+        id_ = repo.add(_imovel("A", "casa", 100_000))
+        repo.update(id_, _imovel("A", "casa", 100_000))
+        assert len(repo.eventos_valor(0)) == 1
+        repo.close_all()
+
+    def test_arquivamento_nao_altera_distribuicao(self, repo):
+        repo.add(_imovel("A", "casa", 100_000, data="2010-01-01"))
+        repo.add(_imovel("A", "casa", 200_000))
+        dist = ValorDistribution()
+        dist._reconstruir(repo)
+        repo.arquivar(datetime.date(2015, 1, 1))
+        dist.sincronizar(repo)
+        assert dist.summary("A", "casa")["count"] == 2
+
+    def test_verificacao_reconstroi_se_total_diverge(self, repo):
+        repo.add(_imovel("A", "casa", 100_000))
+        dist = ValorDistribution()
+        dist._reconstruir(repo)
+        # Carga que não passa pelos gatilhos
+        repo.db.connection().execute("DELETE FROM valor_eventos")
+        repo.db.connection().execute("DROP TRIGGER trg_valor_insert")
+        repo.add(_imovel("A", "casa", 200_000))
+        dist._verificar(repo)
+        assert dist.summary("A", "casa")["count"] == 2
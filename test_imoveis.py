@@ -1,4 +1,4 @@
-from main import app
+from main import app, create_app, warm_up
 import pytest
 
 
@@ -69,7 +69,7 @@ class TestImoveisAPI:
         assert data["tipo_logradouro"] == "Rua"
         assert data["bairro"] == "Bairro Get"
         assert data["cidade"] == "Cidade Get"
-        assert data["cep"] == "55555-000"
+        assert data["cep"] == "55555000"
         assert data["tipo"] == "Venda"
         assert data["valor"] == 100000.00
         assert data["data_aquisicao"] == "2023-05-01"
@@ -454,6 +454,20 @@ class TestImoveisAPI:
         assert "error" in data
         assert "Valor deve ser positivo" in data["error"]
 
+    def test_validation_non_finite_value(self, client):
+        """Testa que Infinity e NaN são rejeitados"""
+        for valor in ("Infinity", "NaN"):
+            response = client.post(
+                "/api/v1/imoveis",
+                data=(
+                    '{"logradouro": "Rua Teste", "cidade": "Cidade Teste",'
+                    f' "tipo": "casa", "valor": {valor}}}'
+                ),
+                content_type="application/json",
+            )
+            assert response.status_code == 400
+            assert "Valor deve ser um número válido" in response.get_json()["error"]
+
     def test_api_docs(self, client):
         """Testa endpoint de documentação da API"""
         response = client.get("/api/v1/docs")
@@ -473,3 +487,341 @@ class TestImoveisAPI:
         assert "version" in data
         assert data["version"] == "v1"
         assert "docs" in data["_links"]
+
+    def test_health_endpoint(self, client):
+        """Testa liveness sem depender do banco"""
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "ok"
+
+    def test_ready_endpoint(self, client):
+        """Testa readiness: pronto após o warm-up"""
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "ready"
+
+    def test_warm_up_so_com_cache(self, capsys):
+        """Testa que o warm-up só pré-carrega páginas com o cache ligado"""
+        sem_cache = create_app({"WARMUP_PAGES": 2, "CACHE_TTL": 0})
+        assert "WARMUP_PAGES is set but CACHE_TTL is 0" in capsys.readouterr().out
+        assert warm_up(sem_cache)
+        assert len(sem_cache.extensions["imoveis_cache"]) == 0
+
+        com_cache = create_app({"WARMUP_PAGES": 2, "CACHE_TTL": 30})
+        assert capsys.readouterr().out == ""
+        assert warm_up(com_cache)
+        assert len(com_cache.extensions["imoveis_cache"]) == 3
+
+    def test_valor_distribution(self, client):
+        """Testa quantis e histograma de valor por cidade/tipo"""
+        valores = [100000.00, 200000.00, 300000.00, 400000.00, 500000.00]
+        ids = []
+        for valor in valores:
+            resp = client.post(
+                "/api/v1/imoveis",
+                json={
+                    "logradouro": "Rua Distribuição",
+                    "cidade": "Cidade Distribuição",
+                    "tipo": "casa",
+                    "valor": valor,
+                },
+            )
+            ids.append(resp.get_json()["id"])
+
+        response = client.get(
+            "/api/v1/imoveis/valor/distribution?cidade=Cidade Distribuição&tipo=casa&buckets=5"
+        )
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["count"] == 5
+        erro = data["error_bounds"]["quantiles_relative_error"]
+        assert abs(data["quantiles"]["p50"] - 300000.00) <= erro * 300000.00
+        assert sum(b["count"] for b in data["histogram"]) == 5
+
+        # Remoções são refletidas sem reconstruir
+        client.delete(f"/api/v1/imoveis/{ids.pop()}")
+        response = client.get(
+            "/api/v1/imoveis/valor/distribution?cidade=Cidade Distribuição"
+        )
+        assert response.get_json()["count"] == 4
+
+        for id_ in ids:
+            client.delete(f"/api/v1/imoveis/{id_}")
+
+    def test_valor_distribution_invalid_buckets(self, client):
+        """Testa validação do número de faixas do histograma"""
+        response = client.get("/api/v1/imoveis/valor/distribution?buckets=abc")
+        assert response.status_code == 400
+        assert "buckets" in response.get_json()["error"]
+
+    def test_get_imoveis_by_data_aquisicao(self, client):
+        """Testa filtro por intervalo de data de aquisição"""
+        datas = ["1991-03-10", "1991-08-20", "1992-01-05"]
+        ids = []
+        for data_aquisicao in datas:
+            resp = client.post(
+                "/api/v1/imoveis",
+                json={
+                    "logradouro": "Rua Intervalo",
+                    "cidade": "Cidade Intervalo",
+                    "tipo": "casa",
+                    "valor": 150000.00,
+                    "data_aquisicao": data_aquisicao,
+                },
+            )
+            ids.append(resp.get_json()["id"])
+
+        response = client.get(
+            "/api/v1/imoveis?cidade=Cidade Intervalo&data_inicio=1991-01-01&data_fim=1991-12-31"
+        )
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["pagination"]["total"] == 2
+        assert sorted(i["data_aquisicao"] for i in data["data"]) == datas[:2]
+        assert "data_inicio=1991-01-01" in data["_links"]["first"]
+
+        for id_ in ids:
+            client.delete(f"/api/v1/imoveis/{id_}")
+
+    def test_get_imoveis_invalid_date(self, client):
+        """Testa validação das datas do intervalo"""
+        response = client.get("/api/v1/imoveis?data_inicio=31/12/2020")
+        assert response.status_code == 400
+        assert "AAAA-MM-DD" in response.get_json()["error"]
+
+    def test_imovel_arquivado(self, client):
+        """Testa que imóveis arquivados saem da listagem mas seguem acessíveis por ID"""
+        import datetime
+
+        resp = client.post(
+            "/api/v1/imoveis",
+            json={
+                "logradouro": "Rua Arquivo",
+                "cidade": "Cidade Arquivo",
+                "tipo": "terreno",
+                "valor": 90000.00,
+                "data_aquisicao": "1985-06-15",
+            },
+        )
+        imovel_id = resp.get_json()["id"]
+
+        movidos = app.extensions["imoveis_repo"].arquivar(datetime.date(1990, 1, 1))
+        assert movidos == 1
+        app.extensions["imoveis_cache"].clear()
+
+        response = client.get("/api/v1/imoveis?cidade=Cidade Arquivo")
+        assert response.get_json()["pagination"]["total"] == 0
+
+        response = client.get(f"/api/v1/imoveis/{imovel_id}")
+        assert response.status_code == 200
+        assert response.get_json()["logradouro"] == "Rua Arquivo"
+
+        response = client.put(
+            f"/api/v1/imoveis/{imovel_id}",
+            json={
+                "logradouro": "Rua Arquivo Atualizada",
+                "cidade": "Cidade Arquivo",
+                "tipo": "terreno",
+                "valor": 95000.00,
+                "data_aquisicao": "1985-06-15",
+            },
+        )
+        assert response.status_code == 200
+        response = client.get(f"/api/v1/imoveis/{imovel_id}")
+        assert response.get_json()["logradouro"] == "Rua Arquivo Atualizada"
+
+        response = client.delete(f"/api/v1/imoveis/{imovel_id}")
+        assert response.status_code == 204
+        response = client.get(f"/api/v1/imoveis/{imovel_id}")
+        assert response.status_code == 404
+
+    def test_invalid_pagination_params(self, client):
+        """Testa que page/per_page malformados retornam 400, não 500"""
+        for query in ("page=abc", "page=0", "per_page=x", "per_page=0"):
+            response = client.get(f"/api/v1/imoveis?{query}")
+            assert response.status_code == 400
+            assert "error" in response.get_json()
+
+    def test_pagination_links(self, client):
+        """Testa os links de paginação montados a partir da URL base"""
+        ids = []
+        for i in range(3):
+            resp = client.post(
+                "/api/v1/imoveis",
+                json={
+                    "logradouro": f"Rua Links {i}",
+                    "cidade": "Cidade Links",
+                    "tipo": "casa",
+                    "valor": 100000.00 + i,
+                },
+            )
+            ids.append(resp.get_json()["id"])
+
+        response = client.get("/api/v1/imoveis?cidade=Cidade Links&per_page=1&page=2")
+        data = response.get_json()
+        links = data["_links"]
+        base = "http://localhost/api/v1/imoveis?cidade=Cidade+Links&per_page=1"
+        assert links["self"] == base + "&page=2"
+        assert links["first"] == base + "&page=1"
+        assert links["prev"] == base + "&page=1"
+        assert links["next"] == base + "&page=3"
+        assert links["last"] == base + "&page=3"
+        assert data["data"][0]["_links"]["self"] == (
+            f"http://localhost/api/v1/imoveis/{data['data'][0]['id']}"
+        )
+
+        # Os links levam à mesma consulta
+        next_page = client.get(links["next"]).get_json()
+        assert next_page["pagination"]["page"] == 3
+        assert next_page["pagination"]["total"] == 3
+
+        for id_ in ids:
+            client.delete(f"/api/v1/imoveis/{id_}")
+
+    def test_cep_normalizado_e_busca_por_prefixo(self, client):
+        """Testa CEP gravado só com dígitos e busca por prefixo"""
+        ids = []
+        for cep in ("85101-000", "85199999", "85200-000"):
+            resp = client.post(
+                "/api/v1/imoveis",
+                json={
+                    "logradouro": "Rua CEP",
+                    "cidade": "Cidade CEP",
+                    "tipo": "casa",
+                    "valor": 200000.00,
+                    "cep": cep,
+                },
+            )
+            ids.append(resp.get_json()["id"])
+
+        response = client.get("/api/v1/imoveis?cep=851")
+        assert response.status_code == 200
+        data = response.get_json()
+        assert sorted(i["cep"] for i in data["data"]) == ["85101000", "85199999"]
+
+        response = client.get("/api/v1/imoveis?cep=85101-000")
+        assert [i["id"] for i in response.get_json()["data"]] == [ids[0]]
+
+        response = client.put(
+            f"/api/v1/imoveis/{ids[2]}",
+            json={
+                "logradouro": "Rua CEP",
+                "cidade": "Cidade CEP",
+                "tipo": "casa",
+                "valor": 200000.00,
+                "cep": "851.50-000",
+            },
+        )
+        assert response.status_code == 200
+        assert client.get(f"/api/v1/imoveis/{ids[2]}").get_json()["cep"] == "85150000"
+        assert client.get("/api/v1/imoveis?cep=851").get_json()["pagination"]["total"] == 3
+
+        response = client.get("/api/v1/imoveis?cep=abc")
+        assert response.status_code == 400
+
+        for id_ in ids:
+            client.delete(f"/api/v1/imoveis/{id_}")
+
+    def test_get_imoveis_by_bairro(self, client):
+        """Testa filtro por bairro dentro de uma cidade"""
+        ids = []
+        for cidade, bairro in (
+            ("Cidade Bairro A", "Centro"),
+            ("Cidade Bairro A", "Boa Vista"),
+            ("Cidade Bairro B", "Centro"),
+        ):
+            resp = client.post(
+                "/api/v1/imoveis",
+                json={
+                    "logradouro": "Rua Bairro",
+                    "cidade": cidade,
+                    "bairro": bairro,
+                    "tipo": "apartamento",
+                    "valor": 300000.00,
+                },
+            )
+            ids.append(resp.get_json()["id"])
+
+        response = client.get("/api/v1/imoveis?cidade=Cidade Bairro A&bairro=Centro")
+        assert response.status_code == 200
+        assert [i["id"] for i in response.get_json()["data"]] == [ids[0]]
+
+        response = client.get("/api/v1/imoveis?bairro=Centro")
+        assert response.status_code == 400
+
+        for id_ in ids:
+            client.delete(f"/api/v1/imoveis/{id_}")
+
+    def test_filtro_sem_acento(self, client):
+        """Testa filtros de cidade e tipo sem diferenciar maiúsculas e acentos"""
+        novo = {
+            "logradouro": "Rua Acento",
+            "cidade": "Cidade São Acentuada",
+            "bairro": "Jardim Paraíso",
+            "tipo": "Sobrado",
+            "valor": 100000.00,
+        }
+        id_ = client.post("/api/v1/imoveis", json=novo).get_json()["id"]
+        for query in (
+            "cidade=CIDADE SÃO ACENTUADA",
+            "cidade=cidade sao acentuada&tipo=SOBRADO",
+            "cidade=Cidade Sao Acentuada&bairro=jardim paraiso",
+        ):
+            response = client.get(f"/api/v1/imoveis?{query}")
+            assert [i["id"] for i in response.get_json()["data"]] == [id_], query
+        client.delete(f"/api/v1/imoveis/{id_}")
+
+    def test_localidades(self, client):
+        """Testa contagens por cidade/bairro mantidas a cada escrita"""
+        def contagens():
+            response = client.get("/api/v1/localidades?cidade=Cidade Localidade")
+            assert response.status_code == 200
+            data = response.get_json()["data"]
+            if not data:
+                return {}
+            return {b["bairro"]: b["total"] for b in data[0]["bairros"]}
+
+        novo = {
+            "logradouro": "Rua Localidade",
+            "cidade": "Cidade Localidade",
+            "tipo": "casa",
+            "valor": 100000.00,
+        }
+        ids = [
+            client.post("/api/v1/imoveis", json={**novo, "bairro": bairro}).get_json()["id"]
+            for bairro in ("Centro", "Centro", "Jardim", None)
+        ]
+        assert contagens() == {"Centro": 2, "Jardim": 1, None: 1}
+
+        response = client.get("/api/v1/localidades")
+        cidade = next(
+            c for c in response.get_json()["data"] if c["cidade"] == "Cidade Localidade"
+        )
+        assert cidade["total"] == 4
+        centro = next(b for b in cidade["bairros"] if b["bairro"] == "Centro")
+        link = centro["_links"]["imoveis"]
+        assert client.get(link).get_json()["pagination"]["total"] == 2
+
+        client.put(f"/api/v1/imoveis/{ids[2]}", json={**novo, "bairro": "Centro"})
+        assert contagens() == {"Centro": 3, None: 1}
+
+        for id_ in ids:
+            client.delete(f"/api/v1/imoveis/{id_}")
+        assert contagens() == {}
+
+    def test_backfill_cep_e_localidades(self, client):
+        """Testa a normalização de CEPs antigos e a reconstrução de localidades"""
+        repo = app.extensions["imoveis_repo"]
+        repo.add_many(
+            [("Rua Antiga", "Rua", "Velho", "Cidade Backfill", "12345-678", "casa", 1.0, None)]
+        )
+        assert repo.normalizar_ceps() >= 1
+        response = client.get("/api/v1/imoveis?cidade=Cidade Backfill")
+        imovel = response.get_json()["data"][0]
+        assert imovel["cep"] == "12345678"
+
+        antes = repo.localidades()
+        repo.recalcular_localidades()
+        assert repo.localidades() == antes
+
+        client.delete(f"/api/v1/imoveis/{imovel['id']}")
@@ -0,0 +1,140 @@
+import argparse
+import datetime
+import sqlite3
+
+import pytest
+
+from maintenance import corte
+from repository import (
+    ALL_COLUMNS,
+    SQLiteRepository,
+    limites_particoes,
+    particoes_arquivaveis,
+)
+
+
+def _troca_interrompida(repo, ids):
+    """Simula um arquivamento que parou logo depois do EXCHANGE PARTITION."""
+    conn = repo.db.connection()
+    conn.execute("CREATE TABLE imoveis_troca AS SELECT * FROM imoveis_arquivo WHERE 0")
+    for id_ in ids:
+        conn.execute(
+            f"INSERT INTO imoveis_troca ({ALL_COLUMNS})"
+            " VALUES (?, 'Rua Troca', 'Rua', 'Centro', 'Cidade', '01000000',"
+            " 'casa', 1000.0, '2012-05-01')",
+            (id_,),
+        )
+
+
+class TestMaintenance:
+    def test_limites_anuais(self):
+        limites = limites_particoes("year", 2020, 1, hoje=datetime.date(2023, 5, 1))
+        assert [nome for nome, _ in limites] == ["p2020", "p2021", "p2022", "p2023", "p2024"]
+        assert limites[0][1] == datetime.date(2021, 1, 1)
+        assert limites[-1][1] == datetime.date(2025, 1, 1)
+
+    def test_limites_mensais(self):
+        limites = limites_particoes("month", 2023, 2, hoje=datetime.date(2023, 11, 20))
+        nomes = [nome for nome, _ in limites]
+        assert nomes[0] == "p202301"
+        assert nomes[-1] == "p202401"
+        assert len(nomes) == 13
+        assert dict(limites)["p202312"] == datetime.date(2024, 1, 1)
+
+    def test_granularidade_invalida(self):
+        with pytest.raises(ValueError):
+            limites_particoes("week", 2020, 1)
+
+    def test_corte(self):
+        args = argparse.Namespace(before="2018-03-01", years=5)
+        assert corte(args) == datetime.date(2018, 3, 1)
+        args = argparse.Namespace(before=None, years=5)
+        assert corte(args) == datetime.date(datetime.date.today().year - 5, 1, 1)
+
+    def test_particoes_arquivaveis(self):
+        particoes = [
+            ("p_sem_data", datetime.date(1000, 1, 1), 3),
+            ("p_antigo", datetime.date(2010, 1, 1), 0),
+            ("p2010", datetime.date(2011, 1, 1), 5),
+            ("p2011", datetime.date(2012, 1, 1), 5),
+            ("p_max", None, 0),
+        ]
+        assert particoes_arquivaveis(particoes, datetime.date(2011, 6, 1)) == [
+            "p_antigo",
+            "p2010",
+        ]
+        assert "p_sem_data" not in particoes_arquivaveis(
+            particoes, datetime.date(2030, 1, 1)
+        )
+
+    def test_retoma_troca_interrompida(self, repo):
+        _troca_interrompida(repo, [101, 102])
+        assert repo._concluir_troca() == 2
+        assert not repo._tabela_existe("imoveis_troca")
+        assert repo.contagens()["imoveis_arquivo"] == 2
+        assert repo.get(101)["logradouro"] == "Rua Troca"
+
+        # Sem troca pendente não há nada a fazer
+        assert repo._concluir_troca() == 0
+
+    def test_troca_com_id_repetido_falha_sem_perder_linhas(self, repo):
+        _troca_interrompida(repo, [201])
+        assert repo._concluir_troca() == 1
+        _troca_interrompida(repo, [201, 202])
+
+        with pytest.raises(sqlite3.IntegrityError):
+            repo._concluir_troca()
+        assert repo._tabela_existe("imoveis_troca")
+        cursor = repo.db.connection().execute("SELECT COUNT(*) FROM imoveis_troca")
+        assert cursor.fetchone()[0] == 2
+
+    def test_poda_eventos_antigos(self, repo):
+        conn = repo.db.connection()
+        conn.execute(
+            "INSERT INTO valor_eventos (cidade, tipo, valor, delta, criado_em)"
+            " VALUES ('A', 'casa', 1.0, 1, datetime('now', '-8 days')),"
+            " ('A', 'casa', 2.0, 1, datetime('now', '-1 hours'))"
+        )
+        assert repo.podar_eventos_valor(7 * 86400) == 1
+        assert [e[3] for e in repo.eventos_valor(0)] == [2.0]
+
+    def test_put_sem_mudanca_nao_mexe_em_localidades(self, repo):
+        imovel = {
+            "logradouro": "Rua A", "tipo_logradouro": "Rua", "bairro": "Centro",
+            "cidade": "Recife", "cep": "50000000", "tipo": "casa",
+            "valor": 1000.0, "data_aquisicao": "2024-01-01",
+        }
+        id_ = repo.add(imovel)
+        conn = repo.db.connection()
+        antes = conn.total_changes
+        repo.update(id_, imovel)
+        # Só a linha de imoveis: nenhum gatilho escreveu
+        assert conn.total_changes - antes == 1
+        repo.update(id_, {**imovel, "bairro": "Boa Vista"})
+        assert [(l["cidade"], l["bairro"]) for l in repo.localidades()] == [
+            ("Recife", "Boa Vista")
+        ]
+
+    def test_migra_collation_nocase(self, tmp_path):
+        path = str(tmp_path / "antigo.db")
+        # Banco criado por uma versão anterior, com COLLATE NOCASE
+        conn = sqlite3.connect(path)
+        for statement in SQLiteRepository.schema:
+            conn.execute(statement.replace("sem_acento", "NOCASE"))
+        conn.execute(
+            f"INSERT INTO imoveis ({ALL_COLUMNS}) VALUES (7, 'Rua A', 'Rua',"
+            " 'Centro', 'São Paulo', '01000000', 'casa', 1000.0, '2020-01-01')"
+        )
+        conn.execute("UPDATE sqlite_sequence SET seq = 9 WHERE name = 'imoveis'")
+        conn.commit()
+        conn.close()
+
+        repo = SQLiteRepository(path)
+        assert repo.count(cidade="sao paulo") == 0
+        assert repo.migrar_collation() == ["imoveis", "imoveis_arquivo", "localidades"]
+        assert repo.migrar_collation() == []
+        assert repo.count(cidade="sao paulo") == 1
+        # O AUTOINCREMENT continua depois do maior ID já usado
+        assert repo.add({"logradouro": "Rua B", "cidade": "Recife"}) == 10
+        assert [l["cidade"] for l in repo.localidades()] == ["Recife"]
+        repo.close_all()
@@ -0,0 +1,53 @@
+import pytest
+
+from query_plan import ListagemSpec, ParametroInvalido, parse_listagem
+
+
+class TestQueryPlan:
+    def test_parse_padrao(self):
+        spec = parse_listagem({})
+        assert spec == ListagemSpec()
+        assert spec.filtros == (None,) * 6
+        assert (spec.sort, spec.order, spec.page, spec.per_page) == ("id", "asc", 1, 10)
+
+    def test_requisicoes_equivalentes_mesmo_spec(self):
+        a = parse_listagem({"tipo": "", "page": "1", "data_inicio": "2020-01-01"})
+        b = parse_listagem({"data_inicio": "2020-01-01"})
+        assert a == b
+        assert hash(a) == hash(b)
+        assert {a: 1}[b] == 1
+
+    def test_per_page_limitado(self):
+        assert parse_listagem({"per_page": "500"}).per_page == 100
+
+    @pytest.mark.parametrize(
+        "args",
+        [
+            {"page": "abc"},
+            {"page": "-1"},
+            {"page": "99999999999999999999"},
+            {"per_page": "1.5"},
+            {"sort": "logradouro"},
+            {"order": "up"},
+            {"data_fim": "2020-13-01"},
+        ],
+    )
+    def test_parametros_invalidos(self, args):
+        with pytest.raises(ParametroInvalido):
+            parse_listagem(args)
+
+    def test_link(self):
+        spec = parse_listagem({"cidade": "São Paulo", "sort": "valor", "page": "3"})
+        base = "http://api/api/v1/imoveis"
+        assert spec.link(base, 4) == (
+            "http://api/api/v1/imoveis?cidade=S%C3%A3o+Paulo&sort=valor&page=4"
+        )
+        assert ListagemSpec().link(base, 2) == base + "?page=2"
+
+    def test_cep_e_bairro(self):
+        spec = parse_listagem({"cep": "851-", "cidade": "Recife", "bairro": "Centro"})
+        assert (spec.cep, spec.bairro) == ("851", "Centro")
+        with pytest.raises(ParametroInvalido):
+            parse_listagem({"cep": "123456789"})
+        with pytest.raises(ParametroInvalido):
+            parse_listagem({"bairro": "Centro"})